@@ -0,0 +1,157 @@
+import argparse
+import sys
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from benchmarks import (
+    match,
+    merge,
+    parse,
+    render,
+    representation,
+    serialization,
+    startup,
+)
+from benchmarks.fixtures import load_fixtures, record_fixtures
+from benchmarks.report import Result, compare, read_results, write_results
+from benchmarks.timing import measure, measure_memory
+from bot.config import _DEFAULT_PAGE_PATH
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Runs once per recorded page instead of once per size
+_FIXTURE_SCENARIO = "parse-fixtures"
+
+
+def _run(
+    name: str,
+    size: int,
+    func: Callable[[], object],
+    args: argparse.Namespace,
+) -> Result:
+    timing = measure(func, rounds=args.rounds)
+    result = Result(
+        scenario=name,
+        size=size,
+        rounds=timing.rounds,
+        best_ms=timing.best * 1000,
+        median_ms=timing.median * 1000,
+        bytes_per_station=measure_memory(func) / size if args.memory else None,
+    )
+
+    line = (
+        f"{name:<24} {size:>7} "
+        f"best {result.best_ms:9.2f} ms  "
+        f"median {result.median_ms:9.2f} ms  "
+        f"({result.median_ms / size * 1000:.2f} µs/station)"
+    )
+    if result.bytes_per_station is not None:
+        line += f"  {result.bytes_per_station:8.0f} B/station"
+    print(line)
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks")
+    parser.add_argument("scenarios", nargs="*")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[200, 1_000, 10_000, 50_000],
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Also measure the memory retained by the result of each scenario",
+    )
+    parser.add_argument(
+        "--page",
+        type=Path,
+        help="A saved copy of the Wikipedia page to use instead of a generated one",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the results as JSON to this file",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        help="Compare the results to those in a JSON file written by --output",
+    )
+    parser.add_argument(
+        "--record",
+        nargs="*",
+        metavar="PAGE_PATH",
+        help="Record the given Wikipedia pages as fixtures instead of benchmarking",
+    )
+    args = parser.parse_args()
+
+    if args.record is not None:
+        for path in record_fixtures(args.record or [_DEFAULT_PAGE_PATH]):
+            print(f"Recorded {path}")
+        return
+
+    scenarios: dict[str, Callable[[int], Callable[[], object]]] = {
+        "decode-strict": representation.prepare_decode_strict,
+        "decode-trusted": representation.prepare_decode_trusted,
+        "encode-payload": serialization.prepare_encode,
+        "encode-done": serialization.prepare_encode_done,
+        "load-models": representation.prepare_models,
+        "load-records": representation.prepare_records,
+        "match": match.prepare_match,
+        "match-build": match.prepare_build,
+        "merge": merge.prepare,
+        "parse-baseline": partial(parse.prepare_baseline, page_path=args.page),
+        "parse-streaming": partial(parse.prepare_streaming, page_path=args.page),
+        "render-cards": render.prepare_cards,
+        "render-progress": render.prepare_progress,
+        "render-progress-cached": render.prepare_progress_cached,
+        "snapshot-load": serialization.prepare_snapshot_load,
+        "snapshot-store": serialization.prepare_snapshot_store,
+        "startup-cold": startup.prepare_cold,
+        "startup-background": startup.prepare_background,
+        "startup-snapshot": startup.prepare_snapshot,
+    }
+
+    names = args.scenarios or [*scenarios, _FIXTURE_SCENARIO]
+    unknown = set(names) - set(scenarios) - {_FIXTURE_SCENARIO}
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in names:
+        if name == _FIXTURE_SCENARIO:
+            fixtures = load_fixtures()
+            if not fixtures:
+                if args.scenarios:
+                    parser.error("No recorded pages found, run with --record")
+                print("No recorded pages found, run with --record", file=sys.stderr)
+
+            for fixture_name, page in fixtures.items():
+                baseline, current, size = parse.prepare_fixture(page)
+                results.append(
+                    _run(f"parse-baseline:{fixture_name}", size, baseline, args)
+                )
+                results.append(_run(f"parse:{fixture_name}", size, current, args))
+            continue
+
+        for size in args.sizes:
+            results.append(_run(name, size, scenarios[name](size), args))
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.compare:
+        print()
+        for line in compare(results, read_results(args.compare)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from bot.model import RouteRecord, StationRecord, StationType, StopType
+
+
+def generate_stations(count: int, *, offset: int = 0) -> list[StationRecord]:
+    stations = []
+    for number in range(offset, offset + count):
+        stations.append(
+            StationRecord(
+                name=f"Bahnhof {number}",
+                name_link=f"https://de.wikipedia.org/wiki/Bahnhof_{number}",
+                type=StationType.BAHNHOF if number % 3 else StationType.HALTEPUNKT,
+                tracks=number % 5 or None,
+                town=f"Stadt {number // 4}",
+                town_link=f"https://de.wikipedia.org/wiki/Stadt_{number // 4}",
+                district=f"K{number % 12}",
+                opening=str(1850 + number % 170),
+                transport_association="NAH.SH",
+                category=str(number % 7 + 1),
+                stop_types=frozenset({StopType.R}),
+                routes=frozenset(
+                    {
+                        RouteRecord(
+                            name=f"Strecke {number // 20}",
+                            link=f"https://de.wikipedia.org/wiki/Strecke_{number // 20}",
+                        )
+                    }
+                ),
+                notes="",
+            )
+        )
+
+    return stations
+
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html class="client-nojs" lang="de" dir="ltr">
+<head>
+<meta charset="UTF-8">
+<title>Liste der Personenbahnhöfe in Schleswig-Holstein – Wikipedia</title>
+<script>RLCONF={"wgPageName":"Liste_der_Personenbahnhöfe","wgTable":"<table>"};</script>
+<link rel="stylesheet" href="/w/load.php?modules=site.styles">
+</head>
+<body>
+<div id="mw-navigation">{navigation}</div>
+<main id="content">
+<h1>Liste der Personenbahnhöfe in Schleswig-Holstein</h1>
+<div class="mw-parser-output">
+<p>Die <b>Liste der Personenbahnhöfe in Schleswig-Holstein</b> enthält alle
+Bahnhöfe und Haltepunkte &amp; Betriebsstellen.</p>
+"""
+
+_TABLE_HEAD = """<table class="wikitable sortable">
+<tbody><tr>
+<th>Name</th><th>Art</th><th>Gleise</th><th>Gemeinde</th><th>Kreis</th>
+<th>Eröffnung</th><th>Verbund</th><th>Kat</th><th>F</th><th>R</th><th>S</th>
+<th>Strecke</th><th>Anmerkungen</th>
+</tr>
+"""
+
+_ROW = """<tr>
+<td><a href="/wiki/Bahnhof_{number}" title="Bahnhof {number}">Bahnhof {number}</a></td>
+<td>{type}</td>
+<td>{tracks}</td>
+<td><a href="/wiki/Stadt_{town}" title="Stadt {town}">Stadt {town}</a></td>
+<td>K{district}</td>
+<td>{day}.&#160;Jun. {year}</td>
+<td>NAH.SH</td>
+<td>{category}</td>
+<td>{f}</td>
+<td>R</td>
+<td>{s}</td>
+<td><a href="/wiki/Strecke_{route}" title="Strecke {route}">Strecke {route}</a>,
+<a href="/w/index.php?title=Strecke_X{route}&amp;action=edit&amp;redlink=1"
+class="new" title="Strecke X{route} (Seite nicht vorhanden)">Strecke X{route}</a></td>
+<td>{notes}<sup class="reference"><a href="#cite_note-{number}">[{number}]</a></sup></td>
+</tr>
+"""
+
+_PAGE_TAIL = """<h2>Einzelnachweise</h2>
+<ol class="references">{references}</ol>
+<table class="navbox"><tbody><tr><td>{navigation}</td></tr></tbody></table>
+</div>
+</main>
+</body>
+</html>
+"""
+
+
+def generate_wiki_page(rows: int) -> str:
+    """
+    Generates a page that is structured like the Wikipedia list of stations.
+
+    Besides the station table, the page contains a navigation, references and a
+    navigation box so the amount of markup outside of the table is realistic.
+    """
+    navigation = "".join(
+        f'<li><a href="/wiki/Seite_{number}">Seite {number}</a></li>'
+        for number in range(500)
+    )
+    parts = [_PAGE_HEAD.replace("{navigation}", navigation), _TABLE_HEAD]
+    for number in range(rows):
+        parts.append(
+            _ROW.format(
+                number=number,
+                type="Hp" if number % 3 else "Bf",
+                tracks=number % 5 or "",
+                town=number // 4,
+                district=number % 12,
+                day=number % 28 + 1,
+                year=1850 + number % 170,
+                category=number % 7 + 1,
+                f="F" if number % 10 == 0 else "",
+                s="S" if number % 4 == 0 else "",
+                route=number // 20,
+                notes="Umbenannt" if number % 9 == 0 else "",
+            )
+        )
+    parts.append("</tbody></table>\n")
+
+    references = "".join(
+        f'<li id="cite_note-{number}"><span class="reference-text">'
+        f'<a class="external text" href="https://example.com/{number}">'
+        f"Quelle {number}</a></span></li>"
+        for number in range(rows)
+    )
+    parts.append(
+        _PAGE_TAIL.replace("{references}", references).replace(
+            "{navigation}", navigation
+        )
+    )
+    return "".join(parts)
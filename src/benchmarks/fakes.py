@@ -0,0 +1,87 @@
+"""
+Offline stand-ins for the Telegram Bot API and Wikipedia, so the application can be
+benchmarked without network access.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+from itertools import count
+from typing import TYPE_CHECKING, Any
+
+import httpx
+from telegram.request import BaseRequest
+
+if TYPE_CHECKING:
+    from telegram.request import RequestData
+
+_BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Station Bot",
+    "username": "station_bot",
+}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Answers Bot API calls locally and counts the calls per endpoint."""
+
+    def __init__(self, *, latency: float = 0) -> None:
+        self.calls: Counter[str] = Counter()
+        self._latency = latency
+        self._message_ids = count(1)
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+        parameters = request_data.parameters if request_data else {}
+        result = self._respond(endpoint, parameters)
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def _respond(self, endpoint: str, parameters: dict[str, Any]) -> object:
+        if endpoint == "getMe":
+            return _BOT_USER
+
+        if endpoint in ("sendMessage", "editMessageText"):
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+
+        return True
+
+
+def create_wiki_transport(page: str, *, latency: float) -> httpx.MockTransport:
+    """Serves page for every page path, after the given simulated round trip time."""
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nAllow: /\n")
+
+        return httpx.Response(200, text=page, headers={"ETag": '"benchmark"'})
+
+    return httpx.MockTransport(handle)
@@ -0,0 +1,60 @@
+import gzip
+from pathlib import Path
+from urllib.parse import unquote
+
+import httpx
+
+from bot.config import UserAgentConfig
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+_BASE_URL = "https://de.wikipedia.org"
+_SUFFIX = ".html.gz"
+
+
+def _fixture_name(page_path: str) -> str:
+    return unquote(page_path).removeprefix("/wiki/")
+
+
+def load_fixtures(directory: Path = FIXTURE_DIR) -> dict[str, str]:
+    """Returns the recorded pages in directory, keyed by their name."""
+    return {
+        path.name.removesuffix(_SUFFIX): gzip.decompress(path.read_bytes()).decode(
+            "utf-8"
+        )
+        for path in sorted(directory.glob(f"*{_SUFFIX}"))
+    }
+
+
+def record_fixtures(
+    page_paths: list[str],
+    directory: Path = FIXTURE_DIR,
+) -> list[Path]:
+    """
+    Saves the current version of the given Wikipedia pages as fixtures.
+
+    This is the only part of the benchmarks that needs network access.
+    """
+    user_agent = UserAgentConfig(
+        client_name="station-bot-benchmark",
+        contact_email="station-bot@bjoernpetersen.net",
+        project_url="https://github.com/preparingforexams/station-bot",
+    )
+    directory.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    with httpx.Client(
+        base_url=_BASE_URL,
+        headers={"User-Agent": user_agent.build_header_value()},
+        timeout=30,
+    ) as client:
+        for page_path in page_paths:
+            response = client.get(page_path)
+            response.raise_for_status()
+
+            path = directory / f"{_fixture_name(page_path)}{_SUFFIX}"
+            # mtime=0 keeps the file identical if the page didn't change
+            path.write_bytes(gzip.compress(response.content, mtime=0))
+            paths.append(path)
+
+    return paths
@@ -0,0 +1,295 @@
+"""
+Replays synthetic updates against the real application to measure handler latency
+and throughput.
+
+Telegram, NATS and Wikipedia are replaced by fakes, so this runs fully offline. The
+state is kept in memory unless a local Redis is given.
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from bs_config import Env
+from telegram import Update
+from telegram.ext import ExtBot
+
+from benchmarks.data import generate_wiki_page
+from benchmarks.fakes import FakeTelegramRequest, create_wiki_transport
+from benchmarks.report import write_document
+from bot.bot import StationBot
+from bot.config import Config, StartupMode, UpdatesConfig
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+    from bot.state import StateStorageFactory, StationState
+
+# Relative frequency of each kind of update
+_KINDS = {
+    "done": 4,
+    "photo": 1,
+    "progress": 2,
+    "station": 3,
+}
+
+
+def _create_storage_factory(
+    redis_url: str | None,
+) -> StateStorageFactory[StationState]:
+    if redis_url is None:
+        from bs_state.implementation import memory_storage
+
+        return lambda initial: memory_storage.load(initial_state=initial)
+
+    from redis.asyncio import Redis
+
+    from bot.storage import RedisStationStorage
+
+    async def create(initial: StationState) -> RedisStationStorage:
+        # A fresh prefix for every run, so runs don't see each other's progress
+        storage = RedisStationStorage(
+            Redis.from_url(redis_url),
+            key_prefix=f"station-bot-load:{time.time_ns()}",
+        )
+        await storage.initialize(initial)
+        return storage
+
+    return create
+
+
+def _generate_updates(
+    bot: ExtBot,
+    *,
+    update_count: int,
+    chats: int,
+    stations: int,
+    seed: int,
+) -> list[tuple[str, Update]]:
+    rng = random.Random(seed)
+    kinds = rng.choices(list(_KINDS), weights=list(_KINDS.values()), k=update_count)
+    now = int(time.time())
+
+    updates = []
+    for update_id, kind in enumerate(kinds, start=1):
+        message: dict[str, Any] = {
+            "message_id": update_id,
+            "date": now,
+            "chat": {"id": rng.randrange(chats) + 1, "type": "group"},
+            "from": {"id": rng.randrange(1000) + 1, "is_bot": False, "first_name": "A"},
+        }
+        station_name = f"Bahnhof {rng.randrange(stations)}"
+        if kind == "photo":
+            message["caption"] = station_name
+            message["photo"] = [
+                {
+                    "file_id": f"photo-{update_id}",
+                    "file_unique_id": f"photo-{update_id}",
+                    "width": 1280,
+                    "height": 960,
+                }
+            ]
+        else:
+            command = f"/{kind}"
+            text = f"{command} {station_name}" if kind == "done" else command
+            message["text"] = text
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(command)}
+            ]
+
+        update = Update.de_json({"update_id": update_id, "message": message}, bot)
+        updates.append((kind, update))
+
+    return updates
+
+
+async def _replay(
+    app: Application,
+    updates: list[tuple[str, Update]],
+    *,
+    concurrency: int,
+) -> tuple[dict[str, list[float]], float]:
+    """
+    Passes the updates to the application like its update queue would, with at most
+    concurrency updates in flight.
+    """
+    latencies: dict[str, list[float]] = defaultdict(list)
+    in_flight = asyncio.Semaphore(concurrency)
+    processor = app.update_processor
+
+    async def process(kind: str, update: Update) -> None:
+        try:
+            start = time.perf_counter()
+            await processor.process_update(update, app.process_update(update))
+            latencies[kind].append(time.perf_counter() - start)
+        finally:
+            in_flight.release()
+
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as group:
+        for kind, update in updates:
+            await in_flight.acquire()
+            group.create_task(process(kind, update))
+
+    return latencies, time.perf_counter() - start
+
+
+def _summarize(latencies: list[float]) -> dict[str, float]:
+    # quantiles() needs at least two values
+    samples = latencies if len(latencies) > 1 else latencies * 2
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(latencies),
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+async def _run(args: argparse.Namespace, config: Config) -> dict[str, Any]:
+    request = FakeTelegramRequest(latency=args.telegram_latency_ms / 1000)
+    bot = ExtBot("1:load-test", request=request, get_updates_request=request)
+    app = StationBot.build_application(
+        config,
+        _create_storage_factory(args.redis),
+        bot=bot,
+        wiki_transport=create_wiki_transport(
+            generate_wiki_page(args.stations),
+            latency=args.wiki_latency_ms / 1000,
+        ),
+    )
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+
+    try:
+        updates = _generate_updates(
+            bot,
+            update_count=args.updates,
+            chats=args.chats,
+            stations=args.stations,
+            seed=args.seed,
+        )
+        request.calls.clear()
+        latencies, duration = await _replay(
+            app,
+            updates,
+            concurrency=args.concurrency,
+        )
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+    return {
+        "parameters": {
+            "updates": args.updates,
+            "chats": args.chats,
+            "stations": args.stations,
+            "concurrency": args.concurrency,
+            "max_concurrent_updates": config.updates.max_concurrent_updates,
+            "telegram_latency_ms": args.telegram_latency_ms,
+            "redis": args.redis is not None,
+        },
+        "duration_s": duration,
+        "updates_per_second": args.updates / duration,
+        "latency": _summarize(
+            [value for values in latencies.values() for value in values]
+        ),
+        "latency_by_kind": {
+            kind: _summarize(values) for kind, values in sorted(latencies.items())
+        },
+        "telegram_calls": dict(request.calls),
+    }
+
+
+def _print_summary(summary: dict[str, Any]) -> None:
+    print(
+        f"{summary['parameters']['updates']} updates in "
+        f"{summary['duration_s']:.2f} s ({summary['updates_per_second']:.1f} updates/s)"
+    )
+    rows = [("all", summary["latency"]), *summary["latency_by_kind"].items()]
+    for kind, latency in rows:
+        print(
+            f"{kind:<10} {latency['count']:>7}  "
+            f"p50 {latency['p50_ms']:8.2f} ms  "
+            f"p95 {latency['p95_ms']:8.2f} ms  "
+            f"p99 {latency['p99_ms']:8.2f} ms"
+        )
+
+    calls = ", ".join(f"{name} {n}" for name, n in summary["telegram_calls"].items())
+    print(f"Telegram calls: {calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.load")
+    parser.add_argument("--updates", type=int, default=5_000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--stations", type=int, default=1_000)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=64,
+        help="How many updates are passed to the application at the same time",
+    )
+    parser.add_argument(
+        "--max-concurrent-updates",
+        type=int,
+        help="Overrides how many handlers the application runs at the same time",
+    )
+    parser.add_argument("--telegram-latency-ms", type=float, default=0)
+    parser.add_argument("--wiki-latency-ms", type=float, default=0)
+    parser.add_argument(
+        "--redis",
+        metavar="URL",
+        help="Store the state in this Redis instead of in memory",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=Path("config-test.toml"),
+        help="The config to start from; state, snapshots and Sentry are disabled",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Write the results as JSON to this file",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = Config.from_env(Env.load(toml_configs=[args.config]))
+    updates_config = config.updates
+    if args.max_concurrent_updates is not None:
+        updates_config = UpdatesConfig(
+            max_concurrent_updates=args.max_concurrent_updates,
+        )
+    config = replace(
+        config,
+        sentry_dsn=None,
+        snapshot_path=None,
+        startup_mode=StartupMode.BLOCKING,
+        state=None,
+        updates=updates_config,
+        wiki=replace(config.wiki, request_interval_ms=0),
+    )
+
+    summary = asyncio.run(_run(args, config))
+    _print_summary(summary)
+
+    if args.output:
+        write_document(args.output, summary)
+
+
+if __name__ == "__main__":
+    main()
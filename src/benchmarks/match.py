@@ -0,0 +1,39 @@
+from typing import TYPE_CHECKING
+
+from benchmarks.data import generate_stations
+from bot.matching import FuzzyMatchingException, StationMatcher
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_QUERIES = 20
+
+
+def _queries(size: int) -> list[str]:
+    step = max(size // _QUERIES, 1)
+    # Users rarely type the exact name, so every other query has a typo
+    return [
+        f"bahnhof {number}" if index % 2 else f"Bahnhf {number}"
+        for index, number in enumerate(range(0, size, step))
+    ]
+
+
+def prepare_build(size: int) -> Callable[[], object]:
+    """Builds the matching index for a station list."""
+    stations = generate_stations(size)
+    return lambda: StationMatcher(stations, version=1)
+
+
+def prepare_match(size: int) -> Callable[[], object]:
+    """Matches a batch of user queries against an existing index."""
+    matcher = StationMatcher(generate_stations(size), version=1)
+    queries = _queries(size)
+
+    def match() -> None:
+        for query in queries:
+            try:
+                matcher.match(query)
+            except FuzzyMatchingException:
+                pass
+
+    return match
@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING
+
+from benchmarks.data import generate_stations
+from bot.state import StationState
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def prepare(size: int) -> Callable[[], object]:
+    """
+    Simulates a refresh: every known station is updated, and a tenth of the fresh
+    list consists of stations that weren't known before.
+    """
+    known = size - size // 10
+    state = StationState.empty().update_stations(generate_stations(known))
+    fresh = generate_stations(size)
+    fresh.reverse()
+
+    return lambda: state.update_stations(fresh)
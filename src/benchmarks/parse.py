@@ -0,0 +1,72 @@
+from typing import TYPE_CHECKING
+
+from httpx import URL
+
+from benchmarks.baseline import BaselineStationParser
+from benchmarks.data import generate_wiki_page
+from bot.wiki import _StationParser
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+_URL = URL("https://de.wikipedia.org/wiki/Liste_der_Personenbahnh%C3%B6fe")
+
+
+def _load_page(size: int, page_path: Path | None) -> str:
+    if page_path is None:
+        return generate_wiki_page(size)
+
+    return page_path.read_text(encoding="utf-8")
+
+
+def _check_baseline(page: str) -> None:
+    baseline = BaselineStationParser(_URL).parse_stations(page)
+    current = _StationParser(_URL).parse_stations(page)
+    if baseline != current:
+        raise ValueError("Parser produced different stations than the baseline")
+
+
+def prepare_baseline(
+    size: int,
+    *,
+    page_path: Path | None = None,
+) -> Callable[[], object]:
+    """Parses the page with the parser from before the table was scanned out."""
+    page = _load_page(size, page_path)
+    _check_baseline(page)
+    parser = BaselineStationParser(_URL)
+    return lambda: parser.parse_stations(page)
+
+
+def prepare_streaming(
+    size: int,
+    *,
+    page_path: Path | None = None,
+) -> Callable[[], object]:
+    page = _load_page(size, page_path)
+    _check_baseline(page)
+    parser = _StationParser(_URL)
+    return lambda: parser.parse_stations(page)
+
+
+def prepare_fixture(
+    page: str,
+) -> tuple[Callable[[], object], Callable[[], object], int]:
+    """
+    Parses a recorded page with the baseline and the current parser.
+
+    Returns both benchmarks and the number of stations.
+    """
+    baseline = BaselineStationParser(_URL)
+    parser = _StationParser(_URL)
+    stations = parser.parse_stations(page)
+    if not stations:
+        raise ValueError("Recorded page contains no stations")
+
+    _check_baseline(page)
+    return (
+        lambda: baseline.parse_stations(page),
+        lambda: parser.parse_stations(page),
+        len(stations),
+    )
@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+from typing import TYPE_CHECKING
+
+from benchmarks.data import generate_stations
+from bot.render import format_station
+from bot.state import StationState
+from bot.view import StationView
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# The maximum length of a Telegram message
+_PAGE_LIMIT = 4096
+
+
+def _state(size: int) -> StationState:
+    stations = generate_stations(size)
+    start = date(2024, 1, 1)
+    return StationState(
+        stations=stations,
+        done_date_by_station_name={
+            station.name: start + timedelta(days=index)
+            for index, station in enumerate(stations[::2])
+        },
+        stations_version=1,
+    )
+
+
+def prepare_progress(size: int) -> Callable[[], object]:
+    """Renders /progress for a state in which half of the stations are done."""
+    state = _state(size)
+    return lambda: list(StationView(state).render_progress_pages(_PAGE_LIMIT))
+
+
+def prepare_progress_cached(size: int) -> Callable[[], object]:
+    """Renders /progress again from a view that is kept between commands."""
+    view = StationView(_state(size))
+    return lambda: list(view.render_progress_pages(_PAGE_LIMIT))
+
+
+def prepare_cards(size: int) -> Callable[[], object]:
+    """Formats the /station card of every station."""
+    stations = generate_stations(size)
+    return lambda: [format_station(station) for station in stations]
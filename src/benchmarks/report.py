@@ -0,0 +1,78 @@
+import json
+import platform
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@dataclass(frozen=True, kw_only=True)
+class Result:
+    scenario: str
+    size: int
+    rounds: int
+    best_ms: float
+    median_ms: float
+    bytes_per_station: float | None = None
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.scenario, self.size
+
+
+def _git_commit() -> str | None:
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def write_document(path: Path, document: dict[str, Any]) -> None:
+    """Writes document as JSON, along with the environment it was measured in."""
+    document = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(UTC).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        **document,
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def write_results(path: Path, results: list[Result]) -> None:
+    write_document(path, {"results": [asdict(result) for result in results]})
+
+
+def read_results(path: Path) -> list[Result]:
+    document = json.loads(path.read_text(encoding="utf-8"))
+    return [Result(**result) for result in document["results"]]
+
+
+def compare(results: list[Result], baseline: list[Result]) -> list[str]:
+    """Describes the change of the median duration of each result in the baseline."""
+    baseline_by_key = {result.key: result for result in baseline}
+    lines = []
+    for result in results:
+        previous = baseline_by_key.get(result.key)
+        if previous is None:
+            continue
+
+        change = result.median_ms / previous.median_ms - 1
+        lines.append(
+            f"{result.scenario:<24} {result.size:>7} "
+            f"{previous.median_ms:9.2f} ms -> {result.median_ms:9.2f} ms "
+            f"({change:+.1%})"
+        )
+
+    return lines
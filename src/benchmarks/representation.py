@@ -0,0 +1,53 @@
+from typing import TYPE_CHECKING
+
+from pydantic import TypeAdapter
+
+from benchmarks.data import generate_stations
+from bot.model import Station, StationRecord
+from bot.storage import (
+    STATIONS_SCHEMA_VERSION,
+    StationListPayload,
+    decode_station_list,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def _dump(size: int) -> bytes:
+    return TypeAdapter(list[StationRecord]).dump_json(generate_stations(size))
+
+
+def prepare_models(size: int) -> Callable[[], object]:
+    """Loads serialized stations as validated pydantic models."""
+    adapter = TypeAdapter(list[Station])
+    data = _dump(size)
+    return lambda: adapter.validate_json(data)
+
+
+def prepare_records(size: int) -> Callable[[], object]:
+    """Loads serialized stations as records."""
+    adapter = TypeAdapter(list[StationRecord])
+    data = _dump(size)
+    return lambda: adapter.validate_json(data)
+
+
+def _dump_payload(size: int, *, schema_version: int) -> str:
+    return StationListPayload(
+        schema_version=schema_version,
+        stations=generate_stations(size),
+        stations_version=1,
+        wiki_validators={},
+    ).model_dump_json()
+
+
+def prepare_decode_trusted(size: int) -> Callable[[], object]:
+    """Decodes a stored station list written with the current schema."""
+    data = _dump_payload(size, schema_version=STATIONS_SCHEMA_VERSION)
+    return lambda: decode_station_list(data)
+
+
+def prepare_decode_strict(size: int) -> Callable[[], object]:
+    """Decodes a stored station list that has to be validated again."""
+    data = _dump_payload(size, schema_version=0)
+    return lambda: decode_station_list(data)
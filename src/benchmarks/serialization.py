@@ -0,0 +1,65 @@
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from benchmarks.data import generate_stations
+from bot.model import CacheValidators
+from bot.snapshot import StationSnapshot, load_snapshot, store_snapshot
+from bot.storage import STATIONS_SCHEMA_VERSION, StationListPayload
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_PARSER_VERSION = 1
+
+
+def prepare_encode(size: int) -> Callable[[], object]:
+    """Encodes a station list the way it is stored in Redis."""
+    stations = generate_stations(size)
+    validators = {
+        "/wiki/Liste": CacheValidators(etag='"benchmark"', last_modified=None)
+    }
+
+    return lambda: StationListPayload(
+        schema_version=STATIONS_SCHEMA_VERSION,
+        stations=list(stations),
+        stations_version=1,
+        wiki_validators=validators,
+    ).model_dump_json()
+
+
+def prepare_encode_done(size: int) -> Callable[[], object]:
+    """Encodes the done dates of every station as written to the Redis hash."""
+    done_dates = {station.name: date(2024, 1, 1) for station in generate_stations(size)}
+    return lambda: {name: done_at.isoformat() for name, done_at in done_dates.items()}
+
+
+def _snapshot(size: int) -> StationSnapshot:
+    return StationSnapshot(
+        stations=generate_stations(size),
+        wiki_validators={
+            "/wiki/Liste": CacheValidators(etag='"benchmark"', last_modified=None)
+        },
+    )
+
+
+def prepare_snapshot_store(size: int) -> Callable[[], object]:
+    """Writes a station snapshot to disk."""
+    snapshot = _snapshot(size)
+    path = Path(tempfile.mkdtemp()) / "stations.snapshot"
+    return lambda: store_snapshot(path, snapshot, parser_version=_PARSER_VERSION)
+
+
+def prepare_snapshot_load(size: int) -> Callable[[], object]:
+    """Reads a station snapshot from disk."""
+    path = Path(tempfile.mkdtemp()) / "stations.snapshot"
+    store_snapshot(path, _snapshot(size), parser_version=_PARSER_VERSION)
+
+    def load() -> StationSnapshot:
+        snapshot = load_snapshot(path, parser_version=_PARSER_VERSION)
+        if snapshot is None:
+            raise ValueError("Snapshot could not be loaded")
+        return snapshot
+
+    return load
@@ -0,0 +1,117 @@
+import asyncio
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from bs_config import Env
+from bs_state.implementation import memory_storage
+from telegram import Update
+from telegram.ext import ExtBot
+
+from benchmarks.data import generate_wiki_page
+from benchmarks.fakes import FakeTelegramRequest, create_wiki_transport
+from bot.bot import StationBot
+from bot.config import Config, StartupMode
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from bs_state import StateStorage
+
+    from bot.state import StationState
+
+_CONFIG_PATH = Path(__file__).parents[2] / "config-test.toml"
+# Simulated round trip time for each request to Wikipedia
+_LATENCY = 0.1
+
+
+def _load_config(snapshot_path: Path | None, startup_mode: StartupMode) -> Config:
+    config = Config.from_env(Env.load(toml_configs=[_CONFIG_PATH]))
+    return replace(
+        config,
+        metrics=None,
+        sentry_dsn=None,
+        snapshot_path=snapshot_path,
+        startup_mode=startup_mode,
+        state=None,
+        wiki=replace(config.wiki, request_interval_ms=0),
+    )
+
+
+def _station_command(bot: ExtBot) -> Update:
+    return Update.de_json(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 1, "type": "group"},
+                "from": {"id": 1, "is_bot": False, "first_name": "A"},
+                "text": "/station",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 8}],
+            },
+        },
+        bot,
+    )
+
+
+async def _start(
+    page: str,
+    snapshot_path: Path | None,
+    startup_mode: StartupMode = StartupMode.BLOCKING,
+) -> None:
+    """Starts the application and waits until it replied to a /station command."""
+
+    async def create_storage(initial: StationState) -> StateStorage[StationState]:
+        return await memory_storage.load(initial_state=initial)
+
+    request = FakeTelegramRequest()
+    bot = ExtBot("1:benchmark", request=request)
+    app = StationBot.build_application(
+        _load_config(snapshot_path, startup_mode),
+        create_storage,
+        bot=bot,
+        wiki_transport=create_wiki_transport(page, latency=_LATENCY),
+    )
+
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+
+        await app.process_update(_station_command(bot))
+        if not request.calls["sendMessage"]:
+            raise ValueError("The bot didn't reply")
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def prepare_cold(size: int) -> Callable[[], object]:
+    """Starts the bot without a snapshot, so it has to wait for Wikipedia."""
+    page = generate_wiki_page(size)
+    return lambda: asyncio.run(_start(page, None))
+
+
+def prepare_background(size: int) -> Callable[[], object]:
+    """
+    Starts the bot without a snapshot, refreshing stations in the background.
+
+    The first reply comes before the refresh completed, so it says that no stations
+    are loaded yet.
+    """
+    page = generate_wiki_page(size)
+    return lambda: asyncio.run(_start(page, None, StartupMode.BACKGROUND))
+
+
+def prepare_snapshot(size: int) -> Callable[[], object]:
+    """Starts the bot from a snapshot written by a previous run."""
+    page = generate_wiki_page(size)
+    snapshot_path = Path(tempfile.mkdtemp()) / "stations.snapshot"
+    asyncio.run(_start(page, snapshot_path))
+    if not snapshot_path.exists():
+        raise ValueError("No snapshot was written")
+
+    return lambda: asyncio.run(_start(page, snapshot_path))
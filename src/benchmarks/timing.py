@@ -0,0 +1,42 @@
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+@dataclass(frozen=True, kw_only=True)
+class Timing:
+    best: float
+    median: float
+    rounds: int
+
+
+def measure(func: Callable[[], object], *, rounds: int) -> Timing:
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    return Timing(
+        best=min(durations),
+        median=statistics.median(durations),
+        rounds=rounds,
+    )
+
+
+def measure_memory(func: Callable[[], object]) -> int:
+    """Returns the number of bytes still allocated by func() while its result lives."""
+    tracemalloc.start()
+    try:
+        result = func()
+        allocated, _ = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return allocated
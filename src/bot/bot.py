@@ -1,132 +1,438 @@
+import asyncio
 import logging
-import random
+import re
 import signal
-from io import StringIO
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 from zoneinfo import ZoneInfo
 
+import sentry_sdk
 from bs_nats_updater import create_updater
-from rapidfuzz import process
-from rapidfuzz.utils_py import default_process
-from telegram import LinkPreviewOptions, Update, constants
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    LinkPreviewOptions,
+    Update,
+    constants,
+)
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 from telegram.ext import (
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     MessageHandler,
     filters,
 )
 
+from bot import metrics, tracing
+from bot.config import StartupMode
 from bot.imported_stations import IMPORTED_STATIONS
-from bot.state import StateStorageFactory, StationState
-from bot.wiki import WikipediaClient
+from bot.metrics import MetricsServer
+from bot.processor import ChatOrderedUpdateProcessor
+from bot.render import format_done_reply, format_done_summary, paginate
+from bot.scheduler import RefreshScheduler
+from bot.snapshot import StationSnapshot, load_snapshot, store_snapshot
+from bot.state import (
+    CachingStateStorage,
+    StateConflictException,
+    StateStorageFactory,
+    StationState,
+)
+from bot.view import StationView
+from bot.wiki import PARSER_VERSION, WikipediaClient
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Awaitable, Callable, Coroutine, Iterable, Mapping
+    from datetime import date
+    from pathlib import Path
 
-    from bs_state import StateStorage
-    from pydantic import HttpUrl
+    import httpx
+    from telegram import Message
+    from telegram.ext import Application, ExtBot
 
-    from bot.config import Config
-    from bot.model import Station
+    from bot.config import Config, MetricsConfig, RefreshConfig
+    from bot.matching import StationMatch
+    from bot.model import CacheValidators, RobotsCache, StationRecord
 
 _logger = logging.getLogger(__name__)
 
+_PROGRESS_CALLBACK_PREFIX = "progress:"
+# How often an update is retried if the state was changed concurrently
+_MAX_UPDATE_ATTEMPTS = 5
 
-DATE_FORMAT = "%d.%m.%Y"
 
+async def _send[**P](
+    method: str,
+    send: Callable[P, Awaitable[object]],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> None:
+    with sentry_sdk.start_span(op="telegram.send", name=method):
+        await send(*args, **kwargs)
+    metrics.TELEGRAM_MESSAGES.labels(method=method).inc()
 
-class FuzzyMatchingException(Exception):
-    def __init__(self, closest_match: str, match_ratio: float) -> None:
-        self.closest_match = closest_match
-        self.match_ratio = match_ratio
 
-        super().__init__(
-            f"No match found, closest match: {closest_match} ({round(match_ratio, 1)}%)",
-        )
+def _instrument(
+    command: str,
+    handler: Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]],
+) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]:
+    async def handle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        with (
+            tracing.transaction(command, op="telegram.handler"),
+            metrics.HANDLER_DURATION.labels(command=command).time(),
+        ):
+            await handler(update, context)
+
+    return handle
+
+
+def _is_snapshot_outdated(snapshot: StationSnapshot, state: StationState) -> bool:
+    """Returns whether the stored stations are at least as recent as the snapshot."""
+    return bool(state.stations) and state.stations_version >= snapshot.stations_version
+
+
+def _split_queries(query: str) -> list[str]:
+    """Splits a /done query into the names of the stations, one per line or comma."""
+    return [name for part in re.split(r"[,\n]", query) if (name := part.strip())]
 
 
 class StationBot:
     def __init__(
         self,
         *,
-        state_storage_factory: StateStorageFactory,
+        state_storage_factory: StateStorageFactory[StationState],
         wiki_client: WikipediaClient,
+        refresh_config: RefreshConfig,
+        snapshot_path: Path | None = None,
+        startup_mode: StartupMode = StartupMode.BLOCKING,
+        metrics_config: MetricsConfig | None = None,
     ) -> None:
         self._state_storage_factory = state_storage_factory
-        self._state_storage: StateStorage[StationState] = None  # type: ignore[assignment]
+        self._state_storage: CachingStateStorage[StationState] = None  # type: ignore[assignment]
         self._wiki_client = wiki_client
+        self._view: StationView | None = None
+        self._snapshot_path = snapshot_path
+        self._has_current_snapshot = False
+        self._startup_mode = startup_mode
+        self._metrics_server = (
+            None
+            if metrics_config is None
+            else MetricsServer(
+                metrics.REGISTRY,
+                host=metrics_config.host,
+                port=metrics_config.port,
+            )
+        )
+        self._refresh_scheduler = RefreshScheduler(
+            self._refresh_stations,
+            interval=refresh_config.interval_seconds,
+            jitter=refresh_config.jitter_seconds,
+            min_backoff=refresh_config.min_backoff_seconds,
+            max_backoff=refresh_config.max_backoff_seconds,
+        )
 
     async def __post_init(self, _) -> None:
         _logger.info("Initializing...")
-        self._state_storage = await self._state_storage_factory(StationState.empty())
+        with tracing.transaction("Startup", op="startup"):
+            refreshed = await self._initialize()
 
-        _logger.info("Trying to update stations from Wikipedia")
-        stations = await self._wiki_client.get_wiki_stations()
-        if stations is None:
-            _logger.warning("Could not retrieve stations")
+        # Started outside the startup transaction, so refreshes are traced on their own
+        if refreshed:
+            self._refresh_scheduler.start()
+        else:
+            _logger.info("Refreshing stations from Wikipedia in the background")
+            self._refresh_scheduler.start(immediately=True)
+
+        _logger.info("Initialization complete")
+
+    async def _initialize(self) -> bool:
+        """Returns whether the stations were refreshed already."""
+        if self._metrics_server is not None:
+            await self._metrics_server.start()
+
+        self._state_storage = CachingStateStorage(
+            await self._state_storage_factory(StationState.empty())
+        )
+
+        # Warms up the state cache, so the first update doesn't have to
+        state = await self._state_storage.load()
+        _logger.info("Loaded state with %d stations", len(state.stations))
+
+        snapshot = await self._load_snapshot()
+        if snapshot is not None and _is_snapshot_outdated(snapshot, state):
+            # Another instance refreshed the stations since the snapshot was written
+            _logger.info("Ignoring station snapshot, the stored stations are newer")
+            return False
+
+        if snapshot is not None:
+            try:
+                await self._apply_stations(
+                    snapshot.stations,
+                    snapshot.wiki_validators,
+                    stations_version=snapshot.stations_version,
+                )
+            except StateConflictException:
+                # The stations will come from Wikipedia instead
+                _logger.error("Could not apply station snapshot due to conflicts")
+            else:
+                self._has_current_snapshot = True
+                return False
+
+        if self._startup_mode == StartupMode.BLOCKING:
+            await self._refresh_scheduler.refresh_now()
+            return True
+
+        return False
+
+    async def _load_snapshot(self) -> StationSnapshot | None:
+        path = self._snapshot_path
+        if path is None:
+            return None
+
+        snapshot = await asyncio.to_thread(
+            load_snapshot,
+            path,
+            parser_version=PARSER_VERSION,
+        )
+        if snapshot is not None:
+            _logger.info("Loaded %d stations from snapshot", len(snapshot.stations))
+
+        return snapshot
+
+    async def _store_snapshot(self, state: StationState) -> None:
+        path = self._snapshot_path
+        if path is None:
+            return
+
+        snapshot = StationSnapshot(
+            stations=list(state.stations),
+            wiki_validators=dict(state.wiki_validators),
+            stations_version=state.stations_version,
+        )
+        try:
+            await asyncio.to_thread(
+                store_snapshot,
+                path,
+                snapshot,
+                parser_version=PARSER_VERSION,
+            )
+        except OSError as e:
+            _logger.error("Could not write station snapshot", exc_info=e)
             return
 
+        self._has_current_snapshot = True
+
+    async def _apply_stations(
+        self,
+        stations: list[StationRecord],
+        validators: Mapping[str, CacheValidators],
+        *,
+        stations_version: int = 0,
+    ) -> StationState:
+        """
+        Merges the given stations into the stored state.
+
+        The stored stations_version is raised to at least stations_version, so a
+        snapshot that was just applied isn't considered newer on the next start.
+        """
+        for _ in range(_MAX_UPDATE_ATTEMPTS):
+            state = await self._state_storage.load()
+            new_state = (
+                state.update_stations(IMPORTED_STATIONS)
+                .update_stations(stations)
+                .with_wiki_validators({**state.wiki_validators, **validators})
+            )
+            if new_state.stations_version < stations_version:
+                new_state = new_state.with_stations_version(stations_version)
+            if new_state is state:
+                return state
+
+            if await self._compare_and_store(state, new_state):
+                # Build the lookup structures now instead of in the next handler
+                self._get_view(new_state).warm_up()
+                return new_state
+
+        raise StateConflictException()
+
+    async def _compare_and_store(
+        self,
+        expected: StationState,
+        state: StationState,
+    ) -> bool:
+        try:
+            await self._state_storage.compare_and_store(expected, state)
+        except StateConflictException:
+            _logger.info("State was changed concurrently, retrying")
+            return False
+
+        return True
+
+    async def _refresh_stations(self) -> bool:
+        with tracing.transaction("Refresh stations", op="refresh"):
+            return await self._do_refresh_stations()
+
+    async def _do_refresh_stations(self) -> bool:
+        _logger.info("Trying to update stations from Wikipedia")
         state = await self._state_storage.load()
-        new_state = state.update_stations(IMPORTED_STATIONS).update_stations(stations)
-        await self._state_storage.store(new_state)
+        # Without stations, the validators are meaningless. Pages last parsed by an
+        # older parser are fetched unconditionally, so the current one parses them.
+        validators = (
+            {
+                url_path: page_validators
+                for url_path, page_validators in state.wiki_validators.items()
+                if page_validators.parser_version == PARSER_VERSION
+            }
+            if state.stations
+            else None
+        )
+        pages = await self._wiki_client.fetch_stations(validators)
+        if pages is None:
+            _logger.warning("Could not retrieve stations")
+            return False
+
+        if pages.stations is None:
+            _logger.info("Stations are unchanged since the last update")
+            if {**state.wiki_validators, **pages.validators} != state.wiki_validators:
+                state = await self._apply_stations([], pages.validators)
+                await self._store_snapshot(state)
+            elif not self._has_current_snapshot:
+                await self._store_snapshot(state)
+        else:
+            state = await self._apply_stations(
+                [station.to_record() for station in pages.stations],
+                pages.validators,
+            )
+            await self._store_snapshot(state)
 
-        _logger.info("Initialization complete")
+        if not pages.complete:
+            _logger.warning("Some station pages could not be retrieved")
+
+        # Failed pages are retried with backoff, the others are merged already
+        return pages.complete
 
     async def __post_shutdown(self, _) -> None:
         _logger.info("Shutting down...")
+        await self._refresh_scheduler.stop()
+
         state_storage = self._state_storage
         if state_storage is None:
             _logger.error("State storage was not initialized")
         else:
-            await self._state_storage.close()
+            _logger.info(
+                "State cache served %d hits and %d misses",
+                state_storage.hits,
+                state_storage.misses,
+            )
+            await state_storage.close()
+
+        await self._wiki_client.close()
+
+        if self._metrics_server is not None:
+            await self._metrics_server.close()
 
         _logger.info("Shutdown complete.")
 
     @classmethod
-    def run(cls, config: Config, state_storage_factory: StateStorageFactory) -> None:
-        bot = cls(
+    def build_application(
+        cls,
+        config: Config,
+        state_storage_factory: StateStorageFactory[StationState],
+        *,
+        robots_storage_factory: StateStorageFactory[RobotsCache] | None = None,
+        bot: ExtBot | None = None,
+        wiki_transport: httpx.AsyncBaseTransport | None = None,
+    ) -> Application:
+        """
+        Builds the application that run() runs.
+
+        If a bot is given, the application has no updater, so updates have to be
+        passed to it directly instead of being received via NATS.
+        """
+        station_bot = cls(
             state_storage_factory=state_storage_factory,
-            wiki_client=WikipediaClient(config.user_agent),
+            wiki_client=WikipediaClient(
+                config.user_agent,
+                config.wiki,
+                transport=wiki_transport,
+                robots_storage_factory=robots_storage_factory,
+            ),
+            refresh_config=config.refresh,
+            snapshot_path=config.snapshot_path,
+            startup_mode=config.startup_mode,
+            metrics_config=config.metrics,
         )
 
+        builder = ApplicationBuilder()
+        if bot is None:
+            builder = builder.updater(
+                create_updater(config.telegram_token, config.nats)
+            )
+        else:
+            builder = builder.bot(bot).updater(None)
+
+        processor = ChatOrderedUpdateProcessor(
+            max_concurrent_updates=config.updates.max_concurrent_updates,
+        )
+        metrics.UPDATE_QUEUE_DEPTH.set_function(lambda: processor.queue_depth)
+        metrics.RUNNING_UPDATES.set_function(lambda: processor.running_updates)
+
         app = (
-            ApplicationBuilder()
-            .updater(create_updater(config.telegram_token, config.nats))
-            .post_init(bot.__post_init)
-            .post_shutdown(bot.__post_shutdown)
+            builder.post_init(station_bot.__post_init)
+            .post_shutdown(station_bot.__post_shutdown)
+            .concurrent_updates(processor)
             .build()
         )
 
         app.add_handler(
             CommandHandler(
                 "done",
-                bot._command_done,
+                _instrument("done", station_bot._command_done),
                 filters=~filters.UpdateType.EDITED_MESSAGE,
             )
         )
         app.add_handler(
             MessageHandler(
                 filters.PHOTO,
-                bot._command_done,
+                _instrument("photo", station_bot._command_done),
             )
         )
         app.add_handler(
             CommandHandler(
                 "progress",
-                bot._command_progress,
+                _instrument("progress", station_bot._command_progress),
                 filters=~filters.UpdateType.EDITED_MESSAGE,
             )
         )
+        app.add_handler(
+            CallbackQueryHandler(
+                _instrument("progress_page", station_bot._callback_progress),
+                pattern=f"^{_PROGRESS_CALLBACK_PREFIX}",
+            )
+        )
         app.add_handler(
             CommandHandler(
                 "station",
-                bot._command_station,
+                _instrument("station", station_bot._command_station),
                 filters=~filters.UpdateType.EDITED_MESSAGE,
             )
         )
 
+        return app
+
+    @classmethod
+    def run(
+        cls,
+        config: Config,
+        state_storage_factory: StateStorageFactory[StationState],
+        *,
+        robots_storage_factory: StateStorageFactory[RobotsCache] | None = None,
+    ) -> None:
+        app = cls.build_application(
+            config,
+            state_storage_factory,
+            robots_storage_factory=robots_storage_factory,
+        )
         app.run_polling(
             stop_signals=[
                 signal.SIGTERM,
@@ -144,51 +450,100 @@ class StationBot:
             _logger.error("Done command had no message")
             return
 
-        args = context.args
-        caption = message.caption
-        if args:
-            query = " ".join(args)
-        elif caption:
-            query = caption
+        if context.args:
+            # Unlike the args, the text keeps the line breaks between station names
+            text = message.text or " ".join(context.args)
+            queries = _split_queries(text.split(maxsplit=1)[-1])
+        elif caption := message.caption:
+            # A caption might describe the photo, so it is always a single name
+            queries = [caption]
         else:
+            queries = []
+
+        if not queries:
             if not message.photo:
-                await message.reply_text(
-                    "Du musst den Namen eines Bahnhofs oder Haltepunkts angeben."
+                await _send(
+                    "sendMessage",
+                    message.reply_text,
+                    "Du musst den Namen eines Bahnhofs oder Haltepunkts angeben.",
                 )
             return
 
-        _logger.info("Extracted query for done command: %s", query)
+        _logger.info("Extracted queries for done command: %s", queries)
 
-        state = await self._state_storage.load()
-        stations = state.stations
-        try:
-            station = self._find_best_station_match(stations, query)
-        except FuzzyMatchingException as e:
-            _logger.warning("Could not find station for query %s: %s", query, e)
-            reply = (
-                "Sorry, das konnte ich nicht zuordnen. Meintest du "
-                f"<code>{e.closest_match}</code>"
-                "?"
-            )
-            await message.reply_text(reply, parse_mode=ParseMode.HTML)
-            return
+        message_time = message.date.astimezone(ZoneInfo("Europe/Berlin"))
+        await self._mark_as_done(message, queries, message_time.date())
 
-        done = state.done_date_by_station_name.get(station.name)
-        if done:
-            reply = f"Der {station.type.value} {station.name} wurde schon am {done.strftime(DATE_FORMAT)} besucht."
-            await message.reply_text(reply)
+    async def _mark_as_done(
+        self,
+        message: Message,
+        queries: list[str],
+        at_date: date,
+    ) -> None:
+        # Other updates and station refreshes might change the state concurrently
+        for _ in range(_MAX_UPDATE_ATTEMPTS):
+            view = self._get_view(await self._state_storage.load())
+            state = view.state
+            if not state.stations:
+                await _send(
+                    "sendMessage",
+                    message.reply_text,
+                    "Keine Stationen geladen.",
+                )
+                return
+
+            marked: dict[str, StationRecord] = {}
+            already_done: dict[str, tuple[StationRecord, date]] = {}
+            uncertain: list[StationMatch] = []
+            for match in view.matcher.match_many(queries):
+                station = match.station
+                if not match.is_confident:
+                    _logger.warning(
+                        "Could not find station for query %s, closest match: %s",
+                        match.query,
+                        station.name,
+                    )
+                    uncertain.append(match)
+                elif done := state.done_date_by_station_name.get(station.name):
+                    already_done[station.name] = (station, done)
+                else:
+                    # The same station might have been listed twice
+                    marked[station.name] = station
+
+            if not marked:
+                break
+
+            new_state = state.mark_many_as_done(marked.values(), at_date)
+            if await self._compare_and_store(state, new_state):
+                view.apply_done(new_state, list(marked.values()))
+                break
+        else:
+            _logger.error(
+                "Could not mark %d stations as done due to conflicts", len(marked)
+            )
+            await _send(
+                "sendMessage",
+                message.reply_text,
+                "Das hat nicht geklappt, versuch es nochmal.",
+            )
             return
 
-        message_time = message.date.astimezone(ZoneInfo("Europe/Berlin"))
-        state = state.mark_as_done(
-            station,
-            message_time.date(),
-        )
-        await self._state_storage.store(state)
+        results = (list(marked.values()), list(already_done.values()), uncertain)
+        if len(queries) == 1:
+            pages: Iterable[str] = [format_done_reply(*results)]
+        else:
+            pages = paginate(
+                format_done_summary(*results),
+                limit=constants.MessageLimit.MAX_TEXT_LENGTH,
+            )
 
-        await message.reply_text(
-            f"Der {station.type.value} {station.name} wurde als besucht markiert.",
-        )
+        for page in pages:
+            await _send(
+                "sendMessage",
+                message.reply_text,
+                page,
+                parse_mode=ParseMode.HTML,
+            )
 
     async def _command_progress(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -198,47 +553,108 @@ class StationBot:
             _logger.error("Progress command had no message")
             return
 
-        state = await self._state_storage.load()
+        view = self._get_view(await self._state_storage.load())
+        pages = list(view.render_progress_pages(constants.MessageLimit.MAX_TEXT_LENGTH))
+        link_preview_options = LinkPreviewOptions(is_disabled=True)
+
+        if len(pages) == 1 or context.args == ["all"]:
+            _logger.info("Sending progress as %d messages", len(pages))
+            should_reply = True
+            for page in pages:
+                if should_reply:
+                    await _send(
+                        "sendMessage",
+                        message.reply_text,
+                        page,
+                        parse_mode=ParseMode.HTML,
+                        link_preview_options=link_preview_options,
+                    )
+                    should_reply = False
+                else:
+                    await _send(
+                        "sendMessage",
+                        message.chat.send_message,
+                        page,
+                        parse_mode=ParseMode.HTML,
+                        link_preview_options=link_preview_options,
+                    )
+            return
 
-        visited = []
-        for station in sorted(state.stations, key=lambda s: s.name):
-            done_at = state.done_date_by_station_name.get(station.name)
-            if not done_at:
-                continue
+        await _send(
+            "sendMessage",
+            message.reply_text,
+            pages[0],
+            parse_mode=ParseMode.HTML,
+            link_preview_options=link_preview_options,
+            reply_markup=self._build_progress_keyboard(0, len(pages)),
+        )
 
-            link = self._format_link(station.name, station.name_link)
-            visited.append(f"{link} ({done_at.strftime(DATE_FORMAT)})")
+    async def _callback_progress(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        query = update.callback_query
+        if not query or not query.data:
+            _logger.error("Progress callback had no data")
+            return
 
-        station_list = "\n".join(visited)
-        reply = f"{len(visited)} / {len(state.stations)}\n\n{station_list}"
+        requested_page = query.data.removeprefix(_PROGRESS_CALLBACK_PREFIX)
+        if not requested_page.isdigit():
+            await query.answer()
+            return
 
-        should_reply = True
+        view = self._get_view(await self._state_storage.load())
+        pages = list(view.render_progress_pages(constants.MessageLimit.MAX_TEXT_LENGTH))
+        # The list might have shrunk since the keyboard was sent
+        page_index = min(int(requested_page), len(pages) - 1)
 
-        async def __send_message(text: str) -> None:
-            link_preview_options = LinkPreviewOptions(is_disabled=True)
-            if should_reply:
-                await message.reply_text(
-                    text,
-                    parse_mode=ParseMode.HTML,
-                    link_preview_options=link_preview_options,
-                )
-            else:
-                await message.chat.send_message(
-                    text,
-                    parse_mode=ParseMode.HTML,
-                    link_preview_options=link_preview_options,
+        await query.answer()
+        try:
+            await _send(
+                "editMessageText",
+                query.edit_message_text,
+                pages[page_index],
+                parse_mode=ParseMode.HTML,
+                link_preview_options=LinkPreviewOptions(is_disabled=True),
+                reply_markup=self._build_progress_keyboard(page_index, len(pages)),
+            )
+        except BadRequest as e:
+            # The page was already shown, e.g. because a button was pressed twice
+            if "message is not modified" not in e.message.lower():
+                raise
+
+    @staticmethod
+    def _build_progress_keyboard(
+        page_index: int,
+        page_count: int,
+    ) -> InlineKeyboardMarkup | None:
+        if page_count < 2:
+            return None
+
+        buttons = []
+        if page_index > 0:
+            buttons.append(
+                InlineKeyboardButton(
+                    "«",
+                    callback_data=f"{_PROGRESS_CALLBACK_PREFIX}{page_index - 1}",
                 )
+            )
 
-        while len(reply) > constants.MessageLimit.MAX_TEXT_LENGTH:
-            _logger.info("Splitting message up...")
-            split_index = reply[: constants.MessageLimit.MAX_TEXT_LENGTH].rindex("\n")
-            part = reply[:split_index]
-            reply = reply[split_index + 1 :]
-            await __send_message(part)
-            should_reply = False
+        buttons.append(
+            InlineKeyboardButton(
+                f"{page_index + 1} / {page_count}",
+                callback_data=f"{_PROGRESS_CALLBACK_PREFIX}current",
+            )
+        )
 
-        if reply:
-            await __send_message(reply)
+        if page_index < page_count - 1:
+            buttons.append(
+                InlineKeyboardButton(
+                    "»",
+                    callback_data=f"{_PROGRESS_CALLBACK_PREFIX}{page_index + 1}",
+                )
+            )
+
+        return InlineKeyboardMarkup([buttons])
 
     async def _command_station(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -248,113 +664,46 @@ class StationBot:
             _logger.error("Station command had no message")
             return
 
-        state = await self._state_storage.load()
-        stations = state.stations
+        view = self._get_view(await self._state_storage.load())
+        stations = view.state.stations
 
         if not stations:
-            await message.reply_text("Keine Stationen geladen.")
+            await _send(
+                "sendMessage",
+                message.reply_text,
+                "Keine Stationen geladen.",
+            )
             return
 
         _logger.debug("Found %d stations in total", len(stations))
-        open_stations = list(state.get_open_stations())
-        _logger.debug("%d stations are not done yet", len(open_stations))
-
-        if not open_stations:
-            await message.reply_text("Alle Stationen wurden besucht. Glückwunsch!")
+        _logger.debug("%d stations are not done yet", view.open_station_count)
+
+        station = view.random_open_station()
+        if station is None:
+            await _send(
+                "sendMessage",
+                message.reply_text,
+                "Alle Stationen wurden besucht. Glückwunsch!",
+            )
             return
 
-        station = random.choice(open_stations)
-        await message.reply_text(
-            self._format_station(station),
+        await _send(
+            "sendMessage",
+            message.reply_text,
+            view.render_station(station),
             parse_mode=ParseMode.HTML,
             link_preview_options=LinkPreviewOptions(is_disabled=True),
         )
 
-    @staticmethod
-    def _format_link(text: str, link: str | HttpUrl | None) -> str:
-        if link is None:
-            return text
-
-        return f"<a href='{link}'>{text}</a>"
-
-    def _format_station(self, station: Station) -> str:
-        buffer = StringIO()
-
-        buffer.write("Name: ")
-        buffer.write(self._format_link(station.name, station.name_link))
-        buffer.write("\n")
-
-        buffer.write("Betriebsstellenart: ")
-        buffer.write(station.type.value)
-        buffer.write("\n")
-
-        if stop_types := station.stop_types:
-            buffer.write("Erreichbar mit ")
-            buffer.write(", ".join(t.value for t in stop_types))
-            buffer.write("\n")
-
-        if routes := station.routes:
-            if len(routes) == 1:
-                buffer.write("Strecke: ")
-            else:
-                buffer.write("Strecken: ")
-
-            buffer.write(", ".join(self._format_link(r.name, r.link) for r in routes))
-            buffer.write("\n")
-
-        if tracks := station.tracks:
-            buffer.write("Gleise: ")
-            buffer.write(str(tracks))
-            buffer.write("\n")
-
-        if town := station.town:
-            buffer.write("Stadt: ")
-            buffer.write(self._format_link(town, station.town_link))
-            buffer.write("\n")
-
-        buffer.write("Kreis: ")
-        buffer.write(station.district)
-        buffer.write("\n")
-
-        if opening := station.opening:
-            buffer.write("Eröffnung: ")
-            buffer.write(opening)
-            buffer.write("\n")
-
-        if transport_association := station.transport_association:
-            buffer.write("Verkehrsbund: ")
-            buffer.write(transport_association)
-            buffer.write("\n")
-
-        if category := station.category:
-            buffer.write("Kategorie: ")
-            buffer.write(category)
-            buffer.write("\n")
-
-        if notes := station.notes:
-            buffer.write("Anmerkungen: ")
-            buffer.write(notes)
-            buffer.write("\n")
-
-        return buffer.getvalue()
-
-    @staticmethod
-    def _find_best_station_match(stations: Iterable[Station], query: str) -> Station:
-        match = process.extractOne(
-            query,
-            {station: station.name for station in stations},
-            processor=default_process,
-        )
-        if match is None:
-            raise ValueError("could not match station")
-
-        _, ratio, result = match
-
-        _logger.info(
-            "Query returned match %s with ratio %f: %s", result.name, ratio, query
-        )
+    def _get_view(self, state: StationState) -> StationView:
+        metrics.STATIONS.set(len(state.stations))
+        metrics.DONE_STATIONS.set(len(state.done_date_by_station_name))
 
-        if ratio > 95:
-            return result
+        view = self._view
+        if view is None:
+            view = StationView(state)
+        else:
+            view = view.for_state(state)
 
-        raise FuzzyMatchingException(result.name, ratio)
+        self._view = view
+        return view
@@ -1,6 +1,8 @@
 import logging
 from dataclasses import dataclass
+from enum import Enum
 from functools import cache
+from pathlib import Path
 from typing import TYPE_CHECKING, Self
 
 from bs_nats_updater import NatsConfig
@@ -19,7 +21,10 @@ class StateConfig:
 
     @property
     def redis_key(self):
-        return f"{self.redis_username}:state"
+        return self.redis_key_for("state")
+
+    def redis_key_for(self, name: str) -> str:
+        return f"{self.redis_username}:{name}"
 
     @classmethod
     def from_env(cls, env: Env) -> Self | None:
@@ -36,6 +41,24 @@ class StateConfig:
         )
 
 
+@dataclass(frozen=True, kw_only=True)
+class MetricsConfig:
+    host: str
+    port: int
+
+    @classmethod
+    def from_env(cls, env: Env) -> Self | None:
+        port = env.get_int("port")
+        if port is None:
+            _logger.info("Metrics endpoint not configured")
+            return None
+
+        return cls(
+            host=env.get_string("host", default="0.0.0.0"),
+            port=port,
+        )
+
+
 @dataclass(frozen=True, kw_only=True)
 class UserAgentConfig:
     client_name: str
@@ -66,22 +89,155 @@ class UserAgentConfig:
         )
 
 
+class ParseExecutorType(str, Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+_DEFAULT_PAGE_PATH = "/wiki/Liste_der_Personenbahnh%C3%B6fe_in_Schleswig-Holstein"
+
+
+@dataclass(frozen=True, kw_only=True)
+class WikiConfig:
+    parse_executor: ParseExecutorType
+    parse_workers: int
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry_seconds: int
+    http2: bool
+    timeout_seconds: int
+    connect_timeout_seconds: int
+    robots_ttl_seconds: int
+    robots_min_backoff_seconds: int
+    robots_max_backoff_seconds: int
+    page_paths: tuple[str, ...]
+    max_concurrent_requests: int
+    request_interval_ms: int
+
+    @classmethod
+    def from_env(cls, env: Env) -> Self:
+        return cls(
+            parse_executor=ParseExecutorType(
+                env.get_string("parse-executor", default="thread")
+            ),
+            parse_workers=env.get_int("parse-workers", default=1),
+            max_connections=env.get_int("max-connections", default=4),
+            max_keepalive_connections=env.get_int(
+                "max-keepalive-connections",
+                default=2,
+            ),
+            keepalive_expiry_seconds=env.get_int(
+                "keepalive-expiry-seconds", default=60
+            ),
+            http2=env.get_bool("http2", default=False),
+            timeout_seconds=env.get_int("timeout-seconds", default=30),
+            connect_timeout_seconds=env.get_int("connect-timeout-seconds", default=10),
+            robots_ttl_seconds=env.get_int("robots-ttl-seconds", default=86400),
+            robots_min_backoff_seconds=env.get_int(
+                "robots-min-backoff-seconds",
+                default=60,
+            ),
+            robots_max_backoff_seconds=env.get_int(
+                "robots-max-backoff-seconds",
+                default=3600,
+            ),
+            page_paths=tuple(
+                path.strip()
+                for path in env.get_string(
+                    "page-paths",
+                    default=_DEFAULT_PAGE_PATH,
+                ).split(",")
+                if path.strip()
+            ),
+            max_concurrent_requests=env.get_int("max-concurrent-requests", default=2),
+            request_interval_ms=env.get_int("request-interval-ms", default=500),
+        )
+
+
+class StartupMode(str, Enum):
+    # Wait for the first station refresh unless a snapshot provided the stations
+    BLOCKING = "blocking"
+    # Start handling updates with the stored state right away
+    BACKGROUND = "background"
+
+
+@dataclass(frozen=True, kw_only=True)
+class RefreshConfig:
+    interval_seconds: int
+    jitter_seconds: int
+    min_backoff_seconds: int
+    max_backoff_seconds: int
+
+    @classmethod
+    def from_env(cls, env: Env) -> Self:
+        return cls(
+            interval_seconds=env.get_int("interval-seconds", default=6 * 60 * 60),
+            jitter_seconds=env.get_int("jitter-seconds", default=10 * 60),
+            min_backoff_seconds=env.get_int("min-backoff-seconds", default=60),
+            max_backoff_seconds=env.get_int("max-backoff-seconds", default=60 * 60),
+        )
+
+
+@dataclass(frozen=True, kw_only=True)
+class UpdatesConfig:
+    max_concurrent_updates: int
+
+    @classmethod
+    def from_env(cls, env: Env) -> Self:
+        return cls(
+            max_concurrent_updates=env.get_int("max-concurrent", default=16),
+        )
+
+
+def _parse_sample_rate(value: str | None) -> float | None:
+    if not value:
+        return None
+
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise ValueError(f"Sample rate must be between 0 and 1, got {rate}")
+
+    return rate
+
+
 @dataclass(frozen=True, kw_only=True)
 class Config:
     app_version: str
+    metrics: MetricsConfig | None
     nats: NatsConfig
+    refresh: RefreshConfig
     sentry_dsn: str | None
+    sentry_traces_sample_rate: float | None
+    snapshot_path: Path | None
+    startup_mode: StartupMode
     state: StateConfig | None
     telegram_token: str
+    updates: UpdatesConfig
     user_agent: UserAgentConfig
+    wiki: WikiConfig
 
     @classmethod
     def from_env(cls, env: Env) -> Self:
         return cls(
             app_version=env.get_string("app-version", default="dev"),
+            metrics=MetricsConfig.from_env(env / "metrics"),
             nats=NatsConfig.from_env(env / "nats"),
+            refresh=RefreshConfig.from_env(env / "refresh"),
             sentry_dsn=env.get_string("sentry-dsn"),
+            sentry_traces_sample_rate=_parse_sample_rate(
+                env.get_string("sentry-traces-sample-rate")
+            ),
+            snapshot_path=(
+                Path(snapshot_path)
+                if (snapshot_path := env.get_string("snapshot-path"))
+                else None
+            ),
+            startup_mode=StartupMode(
+                env.get_string("startup-mode", default=StartupMode.BACKGROUND.value)
+            ),
             state=StateConfig.from_env(env / "state"),
             telegram_token=env.get_string("telegram-token", required=True),
+            updates=UpdatesConfig.from_env(env / "updates"),
             user_agent=UserAgentConfig.from_env(env / "user-agent"),
+            wiki=WikiConfig.from_env(env / "wiki"),
         )
@@ -1,13 +1,13 @@
-from bot.model import Route, Station, StationType, StopType
+from bot.model import RouteRecord, StationRecord, StationType, StopType
 
 IMPORTED_STATIONS = [
-    Station(
+    StationRecord(
         name="Lübeck-Moisling",
-        name_link="https://de.wikipedia.org/wiki/L%C3%BCbeck-Moisling",  # type: ignore[arg-type]
+        name_link="https://de.wikipedia.org/wiki/L%C3%BCbeck-Moisling",
         type=StationType.HALTEPUNKT,
         tracks=2,
         town="Lübeck",
-        town_link="https://de.wikipedia.org/wiki/L%C3%BCbeck",  # type: ignore[arg-type]
+        town_link="https://de.wikipedia.org/wiki/L%C3%BCbeck",
         district="HL",
         opening="22. Dez. 2023",
         transport_association="HVV",
@@ -15,9 +15,9 @@ IMPORTED_STATIONS = [
         stop_types=frozenset({StopType.R}),
         routes=frozenset(
             {
-                Route(
+                RouteRecord(
                     name="Lübeck-Hamburg",
-                    link="https://de.wikipedia.org/wiki/Bahnstrecke_L%C3%BCbeck%E2%80%93Hamburg",  # type: ignore[arg-type]
+                    link="https://de.wikipedia.org/wiki/Bahnstrecke_L%C3%BCbeck%E2%80%93Hamburg",
                 ),
             }
         ),
@@ -10,7 +10,9 @@ from bot.bot import StationBot
 from bot.config import Config
 
 if TYPE_CHECKING:
-    from bot.state import StateStorageFactory
+    from pydantic import BaseModel
+
+    from bot.state import StateStorageFactory, StationState
 
 _logger = logging.getLogger(__name__)
 
@@ -27,13 +29,23 @@ def _setup_sentry(config: Config) -> None:
         _logger.warning("Sentry DSN not configured")
         return
 
+    traces_sample_rate = config.sentry_traces_sample_rate
+    if traces_sample_rate is not None:
+        _logger.info("Tracing %.1f%% of transactions", traces_sample_rate * 100)
+
     sentry_sdk.init(
         dsn=dsn,
         release=config.app_version,
+        # Tracing is disabled if this is None
+        traces_sample_rate=traces_sample_rate,
     )
 
 
-def _create_state_storage_factory(config: Config) -> StateStorageFactory:
+def _create_state_storage_factory[T: BaseModel](
+    config: Config,
+    *,
+    name: str,
+) -> StateStorageFactory[T]:
     state_config = config.state
     if state_config is None:
         from bs_state.implementation import memory_storage
@@ -47,7 +59,26 @@ def _create_state_storage_factory(config: Config) -> StateStorageFactory:
         host=state_config.redis_host,
         username=state_config.redis_username,
         password=state_config.redis_password,
-        key=state_config.redis_key,
+        key=state_config.redis_key_for(name),
+    )
+
+
+def _create_station_storage_factory(
+    config: Config,
+) -> StateStorageFactory[StationState]:
+    state_config = config.state
+    if state_config is None:
+        return _create_state_storage_factory(config, name="state")
+
+    from bot.storage import RedisStationStorage
+
+    return lambda initial: RedisStationStorage.connect(
+        host=state_config.redis_host,
+        username=state_config.redis_username,
+        password=state_config.redis_password,
+        key_prefix=state_config.redis_key_for("station"),
+        legacy_key=state_config.redis_key,
+        initial_state=initial,
     )
 
 
@@ -60,8 +91,11 @@ def main():
 
     _setup_sentry(config)
 
-    state_storage_factory = _create_state_storage_factory(config)
-    StationBot.run(config, state_storage_factory)
+    StationBot.run(
+        config,
+        _create_station_storage_factory(config),
+        robots_storage_factory=_create_state_storage_factory(config, name="robots"),
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import sentry_sdk
+from rapidfuzz import process
+from rapidfuzz.utils import default_process
+
+from bot import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from bot.model import StationRecord
+
+_logger = logging.getLogger(__name__)
+
+# Matches with a lower ratio are only suggestions
+_MIN_RATIO = 95
+
+
+class FuzzyMatchingException(Exception):
+    def __init__(self, closest_match: str, match_ratio: float) -> None:
+        self.closest_match = closest_match
+        self.match_ratio = match_ratio
+
+        super().__init__(
+            f"No match found, closest match: {closest_match} ({round(match_ratio, 1)}%)",
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class StationMatch:
+    query: str
+    station: StationRecord
+    ratio: float
+
+    @property
+    def is_confident(self) -> bool:
+        return self.ratio > _MIN_RATIO
+
+
+class StationMatcher:
+    """
+    Fuzzy-matching index over the names of a station list.
+
+    The station names are preprocessed once on construction, so a matcher should be
+    kept around for as long as the station list (identified by its version) doesn't
+    change.
+    """
+
+    def __init__(self, stations: Sequence[StationRecord], *, version: int) -> None:
+        self.version = version
+        self._stations = list(stations)
+        self._choices = [default_process(station.name) for station in self._stations]
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def match(self, query: str) -> StationRecord:
+        with (
+            sentry_sdk.start_span(op="function", name="Match station"),
+            metrics.MATCH_DURATION.time(),
+        ):
+            match = process.extractOne(
+                default_process(query),
+                self._choices,
+                processor=None,
+            )
+        if match is None:
+            raise ValueError("could not match station")
+
+        _, ratio, index = match
+        metrics.MATCH_SCORE.observe(ratio)
+        result = self._stations[index]
+
+        _logger.info(
+            "Query returned match %s with ratio %f: %s", result.name, ratio, query
+        )
+
+        if ratio > _MIN_RATIO:
+            return result
+
+        raise FuzzyMatchingException(result.name, ratio)
+
+    def match_many(self, queries: Sequence[str]) -> list[StationMatch]:
+        """
+        Finds the closest station for each query.
+
+        Unlike match(), this doesn't reject uncertain matches, they have to be checked
+        via StationMatch.is_confident.
+        """
+        with (
+            sentry_sdk.start_span(op="function", name="Match stations"),
+            metrics.MATCH_DURATION.time(),
+        ):
+            best = [
+                process.extractOne(
+                    default_process(query),
+                    self._choices,
+                    processor=None,
+                )
+                for query in queries
+            ]
+
+        matches = []
+        for query, match in zip(queries, best, strict=True):
+            # There are no choices
+            if match is None:
+                raise ValueError("could not match station")
+
+            _, ratio, index = match
+            metrics.MATCH_SCORE.observe(ratio)
+            matches.append(
+                StationMatch(query=query, station=self._stations[index], ratio=ratio)
+            )
+
+        return matches
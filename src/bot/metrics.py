@@ -0,0 +1,193 @@
+import asyncio
+import logging
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Requests are tiny, anything bigger is not a scrape
+_MAX_REQUEST_SIZE = 8192
+
+# Unlike prometheus_client's default buckets, these resolve millisecond durations
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REGISTRY = CollectorRegistry()
+
+HANDLER_DURATION = Histogram(
+    "station_bot_handler_duration_seconds",
+    "Time spent handling an update",
+    labelnames=("command",),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+STATE_OPERATION_DURATION = Histogram(
+    "station_bot_state_operation_duration_seconds",
+    "Time spent loading or storing the state in the storage backend",
+    labelnames=("operation",),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+STATE_CACHE_REQUESTS = Counter(
+    "station_bot_state_cache_requests",
+    "State loads, by whether they were served from the cache",
+    labelnames=("result",),
+    registry=REGISTRY,
+)
+MATCH_DURATION = Histogram(
+    "station_bot_match_duration_seconds",
+    "Time spent fuzzy-matching a query against the station names",
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+MATCH_SCORE = Histogram(
+    "station_bot_match_score",
+    "Similarity score of the best match for a query",
+    buckets=(50, 60, 70, 80, 90, 95, 99, 100),
+    registry=REGISTRY,
+)
+WIKI_FETCH_DURATION = Histogram(
+    "station_bot_wiki_fetch_duration_seconds",
+    "Time spent fetching a station page from Wikipedia",
+    labelnames=("result",),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+WIKI_PARSE_DURATION = Histogram(
+    "station_bot_wiki_parse_duration_seconds",
+    "Time spent parsing the station table of a Wikipedia page",
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+STATIONS = Gauge(
+    "station_bot_stations",
+    "Number of known stations",
+    registry=REGISTRY,
+)
+DONE_STATIONS = Gauge(
+    "station_bot_done_stations",
+    "Number of stations that were marked as done",
+    registry=REGISTRY,
+)
+TELEGRAM_MESSAGES = Counter(
+    "station_bot_telegram_messages",
+    "Messages sent or edited via the Telegram Bot API",
+    labelnames=("method",),
+    registry=REGISTRY,
+)
+UPDATE_QUEUE_DEPTH = Gauge(
+    "station_bot_update_queue_depth",
+    "Number of updates waiting for their chat or a free handler slot",
+    registry=REGISTRY,
+)
+RUNNING_UPDATES = Gauge(
+    "station_bot_running_updates",
+    "Number of updates that are currently being handled",
+    registry=REGISTRY,
+)
+
+
+class MetricsServer:
+    """
+    Serves the metrics of a registry in the Prometheus text format.
+
+    Unlike prometheus_client's own servers, which run in a separate thread, this one
+    runs on the event loop it was started from. Rendering the metrics takes
+    microseconds, so it doesn't need to be offloaded.
+    """
+
+    def __init__(
+        self,
+        registry: CollectorRegistry,
+        *,
+        host: str,
+        port: int,
+    ) -> None:
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int | None:
+        """The port the server listens on, which might have been chosen by the OS."""
+        server = self._server
+        if server is None or not server.sockets:
+            return None
+
+        return server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle,
+            host=self._host,
+            port=self._port,
+        )
+        _logger.info("Serving metrics on port %s", self.port)
+
+    async def close(self) -> None:
+        server = self._server
+        if server is None:
+            return
+
+        server.close()
+        await server.wait_closed()
+        self._server = None
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError):
+            writer.close()
+            return
+
+        if len(request) > _MAX_REQUEST_SIZE:
+            status, body = "431 Request Header Fields Too Large", b""
+        else:
+            method, _, rest = request.partition(b" ")
+            path = rest.partition(b" ")[0].partition(b"?")[0]
+            if method != b"GET":
+                status, body = "405 Method Not Allowed", b""
+            elif path != b"/metrics":
+                status, body = "404 Not Found", b""
+            else:
+                status, body = "200 OK", generate_latest(self._registry)
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {CONTENT_TYPE_LATEST}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n"
+            "\r\n".encode("ascii")
+            + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
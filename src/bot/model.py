@@ -1,3 +1,6 @@
+import sys
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
 from typing import Annotated, Self
 
@@ -51,6 +54,66 @@ type NonBlankString = Annotated[
 ]
 
 
+def _intern(value: str | None) -> str | None:
+    return None if value is None else sys.intern(value)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class RouteRecord:
+    name: str
+    link: str | None
+
+    def __post_init__(self) -> None:
+        # Routes are shared by many stations
+        object.__setattr__(self, "name", sys.intern(self.name))
+        object.__setattr__(self, "link", _intern(self.link))
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class StationRecord:
+    """
+    A compact, already validated station.
+
+    Stations are kept in memory and passed around as records. The Station model is
+    only used to validate scraped data.
+    """
+
+    name: str
+    name_link: str | None
+    type: StationType
+    tracks: int | None
+    town: str | None
+    town_link: str | None
+    district: str
+    opening: str | None
+    transport_association: str | None
+    category: str | None
+    stop_types: frozenset[StopType]
+    routes: frozenset[RouteRecord]
+    notes: str
+
+    def __post_init__(self) -> None:
+        # Many stations share these values
+        object.__setattr__(self, "town", _intern(self.town))
+        object.__setattr__(self, "town_link", _intern(self.town_link))
+        object.__setattr__(self, "district", sys.intern(self.district))
+        object.__setattr__(
+            self,
+            "transport_association",
+            _intern(self.transport_association),
+        )
+        object.__setattr__(self, "category", _intern(self.category))
+
+    def is_same_station(self, other: StationRecord) -> bool:
+        link = self.name_link
+        other_link = other.name_link
+
+        if link is not None and link == other_link:
+            return True
+
+        return self.name == other.name
+
+
 class Route(BaseModel):
     model_config = ConfigDict(
         frozen=True,
@@ -59,6 +122,13 @@ class Route(BaseModel):
     name: str
     link: HttpUrl | None
 
+    def to_record(self) -> RouteRecord:
+        link = self.link
+        return RouteRecord(
+            name=self.name,
+            link=None if link is None else str(link),
+        )
+
 
 class Station(BaseModel):
     model_config = ConfigDict(
@@ -88,3 +158,68 @@ class Station(BaseModel):
             return True
 
         return self.name == other.name
+
+    def to_record(self) -> StationRecord:
+        name_link = self.name_link
+        town_link = self.town_link
+        return StationRecord(
+            name=self.name,
+            name_link=None if name_link is None else str(name_link),
+            type=self.type,
+            tracks=self.tracks,
+            town=self.town,
+            town_link=None if town_link is None else str(town_link),
+            district=self.district,
+            opening=self.opening,
+            transport_association=self.transport_association,
+            category=self.category,
+            stop_types=self.stop_types,
+            routes=frozenset(route.to_record() for route in self.routes),
+            notes=self.notes,
+        )
+
+
+class CacheValidators(BaseModel):
+    model_config = ConfigDict(
+        frozen=True,
+    )
+
+    etag: str | None
+    last_modified: str | None
+    # The parser version the page was last parsed with. Validators issued for an
+    # older parser must not be used, or the page isn't parsed again until it changes.
+    # Validators stored before this was recorded have version 0.
+    parser_version: int = 0
+
+    def to_request_headers(self) -> dict[str, str]:
+        headers = {}
+        if etag := self.etag:
+            headers["If-None-Match"] = etag
+        if last_modified := self.last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+
+class RobotsCache(BaseModel):
+    """
+    The last fetched robots.txt of Wikipedia.
+
+    A failed fetch keeps the previously fetched content (if any) and is retried with
+    exponential backoff.
+    """
+
+    model_config = ConfigDict(
+        frozen=True,
+    )
+
+    # None if robots.txt has never been fetched successfully
+    content: str | None
+    expires_at: datetime | None
+    failures: int
+
+    @classmethod
+    def empty(cls) -> Self:
+        return cls(content=None, expires_at=None, failures=0)
+
+    def is_fresh(self, now: datetime) -> bool:
+        return self.expires_at is not None and now < self.expires_at
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import sys
+from typing import TYPE_CHECKING, Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+_logger = logging.getLogger(__name__)
+
+
+class _ChatQueue:
+    def __init__(self) -> None:
+        # asyncio.Lock wakes up waiters in FIFO order
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates of different chats concurrently, but updates of the same chat
+    one after another in the order they were received.
+
+    At most max_concurrent_updates handlers run at the same time. Updates that are
+    waiting for their chat or for a free slot count towards the queue depth.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent_updates: int,
+    ) -> None:
+        # The base class semaphore is acquired before do_process_update() is called.
+        # Updates waiting on it wouldn't be counted, so it must never block.
+        super().__init__(sys.maxsize)
+        self._running_semaphore = asyncio.Semaphore(max_concurrent_updates)
+        self._queue_by_chat: dict[int, _ChatQueue] = {}
+        self._running = 0
+        self._peak_queue_depth = 0
+        self._processed = 0
+
+    @property
+    def running_updates(self) -> int:
+        return self._running
+
+    @property
+    def queue_depth(self) -> int:
+        # All updates that entered process_update() and aren't running yet
+        return self.current_concurrent_updates - self._running
+
+    @property
+    def peak_queue_depth(self) -> int:
+        return self._peak_queue_depth
+
+    @property
+    def processed_updates(self) -> int:
+        return self._processed
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._queue_by_chat)
+
+    @staticmethod
+    def _get_chat_id(update: object) -> int | None:
+        if isinstance(update, Update) and (chat := update.effective_chat):
+            return chat.id
+
+        return None
+
+    async def do_process_update(
+        self,
+        update: object,
+        coroutine: Awaitable[Any],
+    ) -> None:
+        self._peak_queue_depth = max(self._peak_queue_depth, self.queue_depth)
+
+        chat_id = self._get_chat_id(update)
+        if chat_id is None:
+            await self._run(coroutine)
+            return
+
+        queue = self._queue_by_chat.get(chat_id)
+        if queue is None:
+            queue = _ChatQueue()
+            self._queue_by_chat[chat_id] = queue
+
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                await self._run(coroutine)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._queue_by_chat[chat_id]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        async with self._running_semaphore:
+            self._running += 1
+            try:
+                await coroutine
+            finally:
+                self._running -= 1
+                self._processed += 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        _logger.info(
+            "Processed %d updates with a peak queue depth of %d",
+            self._processed,
+            self._peak_queue_depth,
+        )
@@ -0,0 +1,211 @@
+from bisect import bisect_left
+from html import escape
+from io import StringIO
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+    from datetime import date
+
+    from bot.matching import StationMatch
+    from bot.model import StationRecord
+
+DATE_FORMAT = "%d.%m.%Y"
+
+
+def format_link(text: str, link: str | None) -> str:
+    if link is None:
+        return text
+
+    return f"<a href='{link}'>{text}</a>"
+
+
+def format_station(station: StationRecord) -> str:
+    buffer = StringIO()
+
+    buffer.write("Name: ")
+    buffer.write(format_link(station.name, station.name_link))
+    buffer.write("\n")
+
+    buffer.write("Betriebsstellenart: ")
+    buffer.write(station.type.value)
+    buffer.write("\n")
+
+    if stop_types := station.stop_types:
+        buffer.write("Erreichbar mit ")
+        buffer.write(", ".join(t.value for t in stop_types))
+        buffer.write("\n")
+
+    if routes := station.routes:
+        if len(routes) == 1:
+            buffer.write("Strecke: ")
+        else:
+            buffer.write("Strecken: ")
+
+        buffer.write(", ".join(format_link(r.name, r.link) for r in routes))
+        buffer.write("\n")
+
+    if tracks := station.tracks:
+        buffer.write("Gleise: ")
+        buffer.write(str(tracks))
+        buffer.write("\n")
+
+    if town := station.town:
+        buffer.write("Stadt: ")
+        buffer.write(format_link(town, station.town_link))
+        buffer.write("\n")
+
+    buffer.write("Kreis: ")
+    buffer.write(station.district)
+    buffer.write("\n")
+
+    if opening := station.opening:
+        buffer.write("Eröffnung: ")
+        buffer.write(opening)
+        buffer.write("\n")
+
+    if transport_association := station.transport_association:
+        buffer.write("Verkehrsbund: ")
+        buffer.write(transport_association)
+        buffer.write("\n")
+
+    if category := station.category:
+        buffer.write("Kategorie: ")
+        buffer.write(category)
+        buffer.write("\n")
+
+    if notes := station.notes:
+        buffer.write("Anmerkungen: ")
+        buffer.write(notes)
+        buffer.write("\n")
+
+    return buffer.getvalue()
+
+
+def paginate(lines: Iterable[str], *, limit: int) -> Iterator[str]:
+    """
+    Joins the given lines into pages of at most limit characters.
+
+    Pages are only split between lines, so a single line that exceeds the limit
+    ends up on a page of its own.
+    """
+    page: list[str] = []
+    # The first line on a page isn't preceded by a line break
+    length = -1
+    for line in lines:
+        added = len(line) + 1
+        if page and length + added > limit:
+            yield "\n".join(page)
+            page = []
+            length = -1
+
+        page.append(line)
+        length += added
+
+    if page:
+        yield "\n".join(page)
+
+
+def format_progress_line(link: str, done_at: date) -> str:
+    return f"{link} ({done_at.strftime(DATE_FORMAT)})"
+
+
+def format_done_reply(
+    marked: Sequence[StationRecord],
+    already_done: Sequence[tuple[StationRecord, date]],
+    uncertain: Sequence[StationMatch],
+) -> str:
+    """Returns the reply to a /done command for a single station."""
+    if marked:
+        station = marked[0]
+        return (
+            f"Der {station.type.value} {escape(station.name)} "
+            "wurde als besucht markiert."
+        )
+
+    if already_done:
+        station, done_at = already_done[0]
+        return (
+            f"Der {station.type.value} {escape(station.name)} "
+            f"wurde schon am {done_at.strftime(DATE_FORMAT)} besucht."
+        )
+
+    return (
+        "Sorry, das konnte ich nicht zuordnen. Meintest du "
+        f"<code>{escape(uncertain[0].station.name)}</code>?"
+    )
+
+
+def format_done_summary(
+    marked: Sequence[StationRecord],
+    already_done: Sequence[tuple[StationRecord, date]],
+    uncertain: Sequence[StationMatch],
+) -> Iterator[str]:
+    """Yields the lines of the reply to a /done command for multiple stations."""
+    sections: list[tuple[str, list[str]]] = [
+        ("Als besucht markiert:", [escape(station.name) for station in marked]),
+        (
+            "Schon besucht:",
+            [
+                format_progress_line(escape(station.name), done_at)
+                for station, done_at in already_done
+            ],
+        ),
+        (
+            "Nicht zugeordnet:",
+            [
+                f"{escape(match.query)} "
+                f"(meintest du <code>{escape(match.station.name)}</code>?)"
+                for match in uncertain
+            ],
+        ),
+    ]
+
+    is_first = True
+    for title, lines in sections:
+        if not lines:
+            continue
+
+        if not is_first:
+            yield ""
+        is_first = False
+
+        yield title
+        for line in lines:
+            yield f"- {line}"
+
+
+class ProgressLines:
+    """
+    The rendered progress lines of all visited stations, sorted by station name.
+
+    Stations can be added and removed without re-rendering or re-sorting the other
+    lines.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str]]) -> None:
+        sorted_entries = sorted(entries, key=lambda entry: entry[0])
+        self._names = [name for name, _ in sorted_entries]
+        self._lines = [line for _, line in sorted_entries]
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def lines(self) -> Sequence[str]:
+        return self._lines
+
+    def add(self, station_name: str, line: str) -> None:
+        index = bisect_left(self._names, station_name)
+        if index < len(self._names) and self._names[index] == station_name:
+            self._lines[index] = line
+            return
+
+        self._names.insert(index, station_name)
+        self._lines.insert(index, line)
+
+    def remove(self, station_name: str) -> None:
+        index = bisect_left(self._names, station_name)
+        if index < len(self._names) and self._names[index] == station_name:
+            del self._names[index]
+            del self._lines[index]
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import random
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+_logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Periodically runs a refresh function in a background task.
+
+    After a failed refresh, the next attempt is scheduled with exponential backoff
+    instead of the regular interval. A random jitter is added to every delay.
+    Refreshes never overlap: requesting a refresh while one is running waits for
+    the running one instead of starting another.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Awaitable[bool]],
+        *,
+        interval: float,
+        jitter: float,
+        min_backoff: float,
+        max_backoff: float,
+    ) -> None:
+        self._refresh = refresh
+        self._interval = interval
+        self._jitter = jitter
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._failures = 0
+        self._in_flight: asyncio.Task[bool] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def failures(self) -> int:
+        return self._failures
+
+    def _next_delay(self) -> float:
+        if self._failures:
+            delay = min(
+                self._min_backoff * 2 ** (self._failures - 1),
+                self._max_backoff,
+            )
+        else:
+            delay = self._interval
+
+        return delay + random.uniform(0, self._jitter)
+
+    async def _run_refresh(self) -> bool:
+        try:
+            success = await self._refresh()
+        except Exception as e:
+            _logger.error("Refresh failed with an exception", exc_info=e)
+            success = False
+
+        if success:
+            self._failures = 0
+        else:
+            self._failures += 1
+
+        return success
+
+    async def refresh_now(self) -> bool:
+        in_flight = self._in_flight
+        if in_flight is None or in_flight.done():
+            in_flight = asyncio.create_task(self._run_refresh())
+            self._in_flight = in_flight
+        else:
+            _logger.debug("Joining refresh that is already running")
+
+        # Callers being cancelled must not cancel the refresh for everyone else
+        return await asyncio.shield(in_flight)
+
+    async def _run(self, delay: float | None) -> None:
+        while True:
+            if delay is None:
+                delay = self._next_delay()
+
+            _logger.debug("Next refresh in %.0f seconds", delay)
+            await asyncio.sleep(delay)
+            delay = None
+            await self.refresh_now()
+
+    def start(self, *, immediately: bool = False) -> None:
+        if self._task is not None:
+            raise ValueError("Scheduler is already running")
+
+        self._task = asyncio.create_task(self._run(0 if immediately else None))
+
+    async def stop(self) -> None:
+        tasks = [task for task in (self._task, self._in_flight) if task is not None]
+        self._task = None
+        self._in_flight = None
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,87 @@
+import logging
+import struct
+import zlib
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from bot.model import CacheValidators, StationRecord
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+_MAGIC = b"STNS"
+# Magic, format version, parser version
+_HEADER = struct.Struct(">4sHH")
+_FORMAT_VERSION = 2
+
+
+class StationSnapshot(BaseModel):
+    """
+    The station list as of the last successful refresh from Wikipedia.
+
+    Snapshots are written to disk in a compressed binary format, so a cold-started
+    bot has a station list without waiting for Wikipedia.
+    """
+
+    model_config = ConfigDict(
+        frozen=True,
+    )
+
+    stations: list[StationRecord]
+    wiki_validators: dict[str, CacheValidators]
+    # The stations_version of the state the snapshot was taken from. Snapshots
+    # written before this was recorded are older than any stored stations.
+    stations_version: int = 0
+
+
+def load_snapshot(path: Path, *, parser_version: int) -> StationSnapshot | None:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        _logger.info("No station snapshot found at %s", path)
+        return None
+    except OSError as e:
+        _logger.error("Could not read station snapshot", exc_info=e)
+        return None
+
+    if len(data) < _HEADER.size:
+        _logger.warning("Station snapshot is truncated")
+        return None
+
+    magic, format_version, snapshot_parser_version = _HEADER.unpack_from(data)
+    if magic != _MAGIC or format_version != _FORMAT_VERSION:
+        _logger.warning("Station snapshot has an unknown format")
+        return None
+
+    if snapshot_parser_version != parser_version:
+        _logger.info(
+            "Ignoring station snapshot written by parser version %d",
+            snapshot_parser_version,
+        )
+        return None
+
+    try:
+        payload = zlib.decompress(data[_HEADER.size :])
+        return StationSnapshot.model_validate_json(payload)
+    except (zlib.error, ValidationError) as e:
+        _logger.warning("Station snapshot is corrupt", exc_info=e)
+        return None
+
+
+def store_snapshot(
+    path: Path,
+    snapshot: StationSnapshot,
+    *,
+    parser_version: int,
+) -> None:
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, parser_version)
+    payload = zlib.compress(snapshot.model_dump_json().encode("utf-8"))
+
+    # Write to a temporary file first so a crash can't leave a partial snapshot
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    temp_path.write_bytes(header + payload)
+    temp_path.replace(path)
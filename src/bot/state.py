@@ -1,24 +1,202 @@
+import asyncio
+from bisect import insort
 from collections.abc import Awaitable, Callable, Iterable, Mapping, Sequence
 from datetime import date
-from typing import Self
+from typing import Any, Protocol, Self, runtime_checkable
 
+import sentry_sdk
 from bs_state import StateStorage
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator
 
-from bot.model import Station
+from bot import metrics
+from bot.model import CacheValidators, StationRecord
 
 type StateStorageFactory[T: BaseModel] = Callable[[T], Awaitable[StateStorage[T]]]
 
 
+class _StationIndex:
+    """
+    Maps station links and names to their positions in a station list.
+
+    find() returns the same position as scanning the list for the first station
+    for which StationRecord.is_same_station is true.
+    """
+
+    def __init__(self, stations: Iterable[StationRecord]) -> None:
+        self._indices_by_link: dict[str, list[int]] = {}
+        self._indices_by_name: dict[str, list[int]] = {}
+        for index, station in enumerate(stations):
+            self.add(index, station)
+
+    @staticmethod
+    def _link_key(station: StationRecord) -> str | None:
+        return station.name_link
+
+    def find(self, station: StationRecord) -> int | None:
+        result: int | None = None
+
+        link = self._link_key(station)
+        if link is not None and (indices := self._indices_by_link.get(link)):
+            result = indices[0]
+
+        if indices := self._indices_by_name.get(station.name):
+            if result is None or indices[0] < result:
+                result = indices[0]
+
+        return result
+
+    def add(self, index: int, station: StationRecord) -> None:
+        link = self._link_key(station)
+        if link is not None:
+            insort(self._indices_by_link.setdefault(link, []), index)
+
+        insort(self._indices_by_name.setdefault(station.name, []), index)
+
+    def remove(self, index: int, station: StationRecord) -> None:
+        link = self._link_key(station)
+        if link is not None:
+            self._indices_by_link[link].remove(index)
+
+        self._indices_by_name[station.name].remove(index)
+
+
+class StateConflictException(Exception):
+    """Raised if the stored state was changed since it was loaded."""
+
+
+@runtime_checkable
+class ConditionalStateStorage[T: BaseModel](Protocol):
+    async def compare_and_store(self, state: T) -> None:
+        """
+        Stores the state unless the stored state changed since it was last loaded or
+        stored through this storage.
+
+        Raises:
+            StateConflictException: If the stored state changed.
+        """
+        ...
+
+
+class CachingStateStorage[T: BaseModel]:
+    """
+    Keeps the most recently loaded or stored state in memory and serves reads from it.
+
+    Stores are written through to the wrapped storage. Writes of this process are
+    serialized. Writes of other processes are only detected by compare_and_store(),
+    and only if the wrapped storage is a ConditionalStateStorage.
+    """
+
+    def __init__(self, storage: StateStorage[T]) -> None:
+        self._storage = storage
+        self._state: T | None = None
+        self._write_lock = asyncio.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    async def load(self) -> T:
+        state = self._state
+        if state is not None:
+            self._hits += 1
+            metrics.STATE_CACHE_REQUESTS.labels(result="hit").inc()
+            return state
+
+        self._misses += 1
+        metrics.STATE_CACHE_REQUESTS.labels(result="miss").inc()
+        with (
+            sentry_sdk.start_span(op="state.load", name="Load state"),
+            metrics.STATE_OPERATION_DURATION.labels(operation="load").time(),
+        ):
+            state = await self._storage.load()
+        self._state = state
+        return state
+
+    async def store(self, state: T) -> None:
+        async with self._write_lock:
+            with (
+                sentry_sdk.start_span(op="state.store", name="Store state"),
+                metrics.STATE_OPERATION_DURATION.labels(operation="store").time(),
+            ):
+                await self._storage.store(state)
+            self._state = state
+
+    async def compare_and_store(self, expected: T, state: T) -> None:
+        """
+        Stores the state if the current state is still the expected one, i.e. the
+        one it was derived from.
+
+        Raises:
+            StateConflictException: If the state changed. The cache is invalidated,
+                so the next load returns the current state.
+        """
+        async with self._write_lock:
+            if self._state is not expected:
+                raise StateConflictException()
+
+            storage = self._storage
+            operation = (
+                "compare_and_store"
+                if isinstance(storage, ConditionalStateStorage)
+                else "store"
+            )
+            try:
+                with (
+                    sentry_sdk.start_span(op="state.store", name="Store state"),
+                    metrics.STATE_OPERATION_DURATION.labels(operation=operation).time(),
+                ):
+                    if isinstance(storage, ConditionalStateStorage):
+                        await storage.compare_and_store(state)
+                    else:
+                        await storage.store(state)
+            except StateConflictException:
+                self._state = None
+                raise
+
+            self._state = state
+
+    def invalidate(self) -> None:
+        self._state = None
+
+    async def close(self) -> None:
+        self._state = None
+        await self._storage.close()
+
+
 class StationState(BaseModel):
     model_config = ConfigDict(
         frozen=True,
     )
 
-    stations: Sequence[Station]
+    stations: Sequence[StationRecord]
     done_date_by_station_name: Mapping[str, date]
+    # Incremented whenever update_stations changes the station list
+    stations_version: int = 0
+    # Cache validators of the Wikipedia pages the stations were last updated from,
+    # keyed by URL path
+    wiki_validators: Mapping[str, CacheValidators] = {}
 
-    def get_open_stations(self) -> Iterable[Station]:
+    @field_validator("wiki_validators", mode="before")
+    @classmethod
+    def _migrate_wiki_validators(cls, value: Any) -> Any:
+        # Before multiple pages were supported, this held the validators of the
+        # only page. Dropping them just causes one unconditional fetch.
+        if value is None or (isinstance(value, Mapping) and "etag" in value):
+            return {}
+        return value
+
+    def _replace(self, **changes: Any) -> Self:
+        # All values are derived from already validated ones, so validating the
+        # whole station list again would only cost time
+        return self.model_copy(update=changes)
+
+    def get_open_stations(self) -> Iterable[StationRecord]:
         for station in self.stations:
             if not self.done_date_by_station_name.get(station.name):
                 yield station
@@ -30,39 +208,59 @@ class StationState(BaseModel):
             done_date_by_station_name={},
         )
 
-    def update_stations(self, fresh_stations: list[Station]) -> Self:
+    def update_stations(self, fresh_stations: list[StationRecord]) -> Self:
         stations = list(self.stations)
+        index = _StationIndex(stations)
         for fresh_station in fresh_stations:
-            old_index = -1
-            for index, station in enumerate(stations):
-                if station.is_same_station(fresh_station):
-                    old_index = index
-                    break
-
-            if old_index > -1:
-                stations[old_index] = fresh_station
-            else:
+            old_index = index.find(fresh_station)
+            if old_index is None:
+                index.add(len(stations), fresh_station)
                 stations.append(fresh_station)
+            else:
+                index.remove(old_index, stations[old_index])
+                index.add(old_index, fresh_station)
+                stations[old_index] = fresh_station
+
+        if stations == list(self.stations):
+            return self
 
-        return StationState(  # type: ignore[return-value]
+        return self._replace(
             stations=stations,
-            done_date_by_station_name=self.done_date_by_station_name,
+            stations_version=self.stations_version + 1,
         )
 
+    def with_stations_version(self, version: int) -> Self:
+        if version == self.stations_version:
+            return self
+
+        return self._replace(stations_version=version)
+
+    def with_wiki_validators(self, validators: Mapping[str, CacheValidators]) -> Self:
+        if validators == self.wiki_validators:
+            return self
+
+        return self._replace(wiki_validators=validators)
+
     def mark_as_done(
         self,
-        station: Station,
+        station: StationRecord,
+        at_date: date,
+    ) -> Self:
+        return self.mark_many_as_done([station], at_date)
+
+    def mark_many_as_done(
+        self,
+        stations: Iterable[StationRecord],
         at_date: date,
     ) -> Self:
         done_date_by_station_name = dict(self.done_date_by_station_name)
-        if station.name in done_date_by_station_name:
-            raise ValueError("Station already done")
+        for station in stations:
+            if station.name in done_date_by_station_name:
+                raise ValueError("Station already done")
 
-        done_date_by_station_name[station.name] = at_date
-        return StationState(  # type: ignore[return-value]
-            stations=self.stations,
-            done_date_by_station_name=done_date_by_station_name,
-        )
+            done_date_by_station_name[station.name] = at_date
+
+        return self._replace(done_date_by_station_name=done_date_by_station_name)
 
     def mark_undone(self, station_name: str) -> Self:
         done_date_by_station_name = dict(self.done_date_by_station_name)
@@ -70,7 +268,4 @@ class StationState(BaseModel):
             raise ValueError("Station wasn't done")
 
         del done_date_by_station_name[station_name]
-        return StationState(  # type: ignore[return-value]
-            stations=self.stations,
-            done_date_by_station_name=done_date_by_station_name,
-        )
+        return self._replace(done_date_by_station_name=done_date_by_station_name)
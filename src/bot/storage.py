@@ -0,0 +1,259 @@
+import logging
+from datetime import date
+from typing import TYPE_CHECKING, Self
+
+from bs_state import StateStorage
+from pydantic import BaseModel, ConfigDict, ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from bot.model import CacheValidators, Station, StationRecord
+from bot.state import StateConflictException, StationState
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from redis.asyncio.client import Pipeline
+
+_logger = logging.getLogger(__name__)
+
+
+# Must be incremented whenever the format of stored stations changes
+STATIONS_SCHEMA_VERSION = 1
+
+
+class StationListPayload(BaseModel):
+    model_config = ConfigDict(
+        frozen=True,
+    )
+
+    # Payloads written before the schema was versioned don't have this
+    schema_version: int = 0
+    stations: list[StationRecord]
+    stations_version: int
+    wiki_validators: dict[str, CacheValidators]
+
+
+class _StrictStationListPayload(BaseModel):
+    stations: list[Station]
+    stations_version: int = 0
+    # A single CacheValidators in states from before multiple pages were supported
+    wiki_validators: dict[str, CacheValidators] | CacheValidators | None = None
+    done_date_by_station_name: dict[str, date] = {}
+
+
+def decode_station_list(raw: bytes | str) -> StationListPayload:
+    """
+    Decodes a stored station list.
+
+    Station lists written with the current schema version were validated before
+    they were stored, so they are only checked for their structure. Others are
+    validated as if they were freshly scraped.
+    """
+    try:
+        payload = StationListPayload.model_validate_json(raw)
+    except ValidationError:
+        payload = None
+
+    if payload is not None and payload.schema_version == STATIONS_SCHEMA_VERSION:
+        return payload
+
+    _logger.info("Validating station list with an outdated schema")
+    return _decode_strict(raw)[0]
+
+
+def _decode_strict(raw: bytes | str) -> tuple[StationListPayload, dict[str, date]]:
+    strict = _StrictStationListPayload.model_validate_json(raw)
+    payload = StationListPayload(
+        schema_version=STATIONS_SCHEMA_VERSION,
+        stations=[station.to_record() for station in strict.stations],
+        stations_version=strict.stations_version,
+        wiki_validators=(
+            strict.wiki_validators if isinstance(strict.wiki_validators, dict) else {}
+        ),
+    )
+    return payload, strict.done_date_by_station_name
+
+
+class RedisStationStorage(StateStorage[StationState]):
+    """
+    Stores a StationState in Redis, split into the station list and the done dates.
+
+    The station list is a single JSON value, the done dates are a hash keyed by
+    station name. store() only writes what changed since the last load or store, so
+    marking a station as done is a single hash field write.
+
+    Every write increments a revision counter, which compare_and_store() uses to
+    detect writes by other processes.
+    """
+
+    def __init__(self, redis: Redis, *, key_prefix: str) -> None:
+        self._redis = redis
+        self._stations_key = f"{key_prefix}:stations"
+        self._done_key = f"{key_prefix}:done"
+        self._revision_key = f"{key_prefix}:revision"
+        # The state as it is known to be in Redis
+        self._stored: StationState | None = None
+        self._revision = 0
+
+    @classmethod
+    async def connect(
+        cls,
+        *,
+        host: str,
+        username: str,
+        password: str,
+        key_prefix: str,
+        legacy_key: str | None = None,
+        initial_state: StationState,
+    ) -> Self:
+        redis = Redis(host=host, username=username, password=password)
+        storage = cls(redis, key_prefix=key_prefix)
+        await storage.initialize(initial_state, legacy_key=legacy_key)
+        return storage
+
+    async def initialize(
+        self,
+        initial_state: StationState,
+        *,
+        legacy_key: str | None = None,
+    ) -> None:
+        if await self._redis.exists(self._stations_key):
+            return
+
+        state = initial_state
+        if legacy_key is not None:
+            state = await self._load_legacy(legacy_key) or initial_state
+
+        # Nothing is known to be stored yet, so everything is written
+        await self.store(state)
+
+    async def _load_legacy(self, key: str) -> StationState | None:
+        """
+        Loads the state stored under key by the previous storage format.
+
+        Raises:
+            ValidationError: If the legacy state is invalid. Nothing is written then,
+                so the migration is retried on the next start.
+        """
+        raw = await self._redis.get(key)
+        if raw is None:
+            return None
+
+        payload, done_dates = _decode_strict(raw)
+
+        state = StationState.model_construct(
+            stations=payload.stations,
+            done_date_by_station_name=done_dates,
+            stations_version=payload.stations_version,
+            wiki_validators=payload.wiki_validators,
+        )
+
+        _logger.info(
+            "Migrating legacy state with %d done stations",
+            len(state.done_date_by_station_name),
+        )
+        return state
+
+    async def load(self) -> StationState:
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            pipeline.get(self._stations_key)
+            pipeline.hgetall(self._done_key)
+            pipeline.get(self._revision_key)
+            raw_stations, raw_dates, raw_revision = await pipeline.execute()
+
+        if raw_stations is None:
+            raise ValueError("Station storage was not initialized")
+
+        payload = decode_station_list(raw_stations)
+        # Everything was validated by now
+        state = StationState.model_construct(
+            stations=payload.stations,
+            done_date_by_station_name={
+                name.decode("utf-8"): date.fromisoformat(value.decode("utf-8"))
+                for name, value in raw_dates.items()
+            },
+            stations_version=payload.stations_version,
+            wiki_validators=payload.wiki_validators,
+        )
+        self._stored = state
+        self._revision = int(raw_revision or 0)
+        return state
+
+    async def store(self, state: StationState) -> None:
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            self._queue_writes(pipeline, state)
+            *_, revision = await pipeline.execute()
+
+        self._stored = state
+        self._revision = revision
+
+    async def compare_and_store(self, state: StationState) -> None:
+        async with self._redis.pipeline(transaction=True) as pipeline:
+            await pipeline.watch(self._revision_key)
+            if int(await pipeline.get(self._revision_key) or 0) != self._revision:
+                raise StateConflictException()
+
+            pipeline.multi()
+            self._queue_writes(pipeline, state)
+            try:
+                *_, revision = await pipeline.execute()
+            except WatchError as e:
+                raise StateConflictException() from e
+
+        self._stored = state
+        self._revision = revision
+
+    def _queue_writes(self, pipeline: Pipeline, state: StationState) -> None:
+        stored = self._stored
+        if (
+            stored is None
+            or state.stations_version != stored.stations_version
+            or state.wiki_validators != stored.wiki_validators
+        ):
+            payload = StationListPayload(
+                schema_version=STATIONS_SCHEMA_VERSION,
+                stations=list(state.stations),
+                stations_version=state.stations_version,
+                wiki_validators=dict(state.wiki_validators),
+            )
+            pipeline.set(self._stations_key, payload.model_dump_json())
+
+        if stored is None:
+            pipeline.delete(self._done_key)
+            changed = state.done_date_by_station_name
+            removed: list[str] = []
+        else:
+            changed, removed = _diff_dates(
+                stored.done_date_by_station_name,
+                state.done_date_by_station_name,
+            )
+
+        if changed:
+            pipeline.hset(
+                self._done_key,
+                mapping={
+                    name: done_at.isoformat() for name, done_at in changed.items()
+                },
+            )
+        if removed:
+            pipeline.hdel(self._done_key, *removed)
+
+        pipeline.incr(self._revision_key)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _diff_dates(
+    old: Mapping[str, date],
+    new: Mapping[str, date],
+) -> tuple[dict[str, date], list[str]]:
+    if old is new:
+        return {}, []
+
+    changed = {
+        name: done_at for name, done_at in new.items() if old.get(name) != done_at
+    }
+    removed = [name for name in old if name not in new]
+    return changed, removed
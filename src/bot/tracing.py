@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import sentry_sdk
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@contextmanager
+def transaction(name: str, *, op: str) -> Iterator[None]:
+    """
+    Traces the block as a transaction, or as a span if it is part of one already
+    (e.g. the first station refresh during startup).
+
+    Updates are handled concurrently, so each transaction gets its own scope.
+    Without that, their spans would end up in whichever transaction was started
+    last. If tracing isn't enabled, this does nothing.
+    """
+    if sentry_sdk.get_current_span() is not None:
+        with sentry_sdk.start_span(op=op, name=name):
+            yield
+        return
+
+    with sentry_sdk.isolation_scope(), sentry_sdk.start_transaction(op=op, name=name):
+        yield
@@ -0,0 +1,215 @@
+import random
+from itertools import chain
+from typing import TYPE_CHECKING
+
+from bot.matching import StationMatcher
+from bot.render import (
+    ProgressLines,
+    format_link,
+    format_progress_line,
+    format_station,
+    paginate,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from bot.model import StationRecord
+    from bot.state import StationState
+
+
+class OpenStations:
+    """
+    The stations that haven't been visited yet, keyed by name.
+
+    Adding and removing a station as well as drawing a random one take constant time.
+    """
+
+    def __init__(self, stations: Iterable[StationRecord]) -> None:
+        self._stations: list[StationRecord] = []
+        self._index_by_name: dict[str, int] = {}
+        for station in stations:
+            self.add(station)
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def __contains__(self, station_name: str) -> bool:
+        return station_name in self._index_by_name
+
+    def add(self, station: StationRecord) -> None:
+        if station.name in self._index_by_name:
+            return
+
+        self._index_by_name[station.name] = len(self._stations)
+        self._stations.append(station)
+
+    def discard(self, station_name: str) -> None:
+        index = self._index_by_name.pop(station_name, None)
+        if index is None:
+            return
+
+        # Fill the gap with the last station instead of shifting the whole tail
+        last = self._stations.pop()
+        if index < len(self._stations):
+            self._stations[index] = last
+            self._index_by_name[last.name] = index
+
+    def choice(self) -> StationRecord | None:
+        if not self._stations:
+            return None
+
+        return self._stations[random.randrange(len(self._stations))]
+
+
+class _StationList:
+    """Lookup structures and rendered fragments that only depend on the station list."""
+
+    def __init__(self, stations: Sequence[StationRecord], *, version: int) -> None:
+        self.version = version
+        self._stations = stations
+        self._matcher: StationMatcher | None = None
+        self._station_by_name: dict[str, StationRecord] | None = None
+        self._link_by_name: dict[str, str] = {}
+        self._card_by_name: dict[str, str] = {}
+
+    @property
+    def matcher(self) -> StationMatcher:
+        matcher = self._matcher
+        if matcher is None:
+            matcher = StationMatcher(self._stations, version=self.version)
+            self._matcher = matcher
+
+        return matcher
+
+    def warm_up(self) -> None:
+        _ = self.matcher
+
+    def get_station(self, name: str) -> StationRecord | None:
+        station_by_name = self._station_by_name
+        if station_by_name is None:
+            station_by_name = {}
+            for station in self._stations:
+                station_by_name.setdefault(station.name, station)
+            self._station_by_name = station_by_name
+
+        return station_by_name.get(name)
+
+    def get_link(self, station: StationRecord) -> str:
+        link = self._link_by_name.get(station.name)
+        if link is None:
+            link = format_link(station.name, station.name_link)
+            self._link_by_name[station.name] = link
+
+        return link
+
+    def get_card(self, station: StationRecord) -> str:
+        card = self._card_by_name.get(station.name)
+        if card is None:
+            card = format_station(station)
+            self._card_by_name[station.name] = card
+
+        return card
+
+
+class StationView:
+    """
+    Lookup structures derived from a StationState.
+
+    Stored changes should be applied to the view, which updates its structures
+    incrementally. A view for a different state is obtained via for_state(), which
+    keeps everything that only depends on the station list if that didn't change.
+    """
+
+    def __init__(
+        self,
+        state: StationState,
+        *,
+        station_list: _StationList | None = None,
+    ) -> None:
+        if station_list is None or station_list.version != state.stations_version:
+            station_list = _StationList(state.stations, version=state.stations_version)
+
+        self._state = state
+        self._station_list = station_list
+        self._open_stations = OpenStations(state.get_open_stations())
+        self._progress_lines = ProgressLines(self._render_visited(state))
+
+    @property
+    def state(self) -> StationState:
+        return self._state
+
+    @property
+    def matcher(self) -> StationMatcher:
+        return self._station_list.matcher
+
+    @property
+    def open_station_count(self) -> int:
+        return len(self._open_stations)
+
+    @property
+    def progress_lines(self) -> Sequence[str]:
+        return self._progress_lines.lines
+
+    def _render_visited(self, state: StationState) -> Iterable[tuple[str, str]]:
+        station_list = self._station_list
+        for name, done_at in state.done_date_by_station_name.items():
+            if station := station_list.get_station(name):
+                link = station_list.get_link(station)
+                yield name, format_progress_line(link, done_at)
+
+    def render_progress_pages(self, limit: int) -> Iterator[str]:
+        lines = self._progress_lines.lines
+        header = f"{len(lines)} / {len(self._state.stations)}"
+        return paginate(chain((header, ""), lines), limit=limit)
+
+    def render_station(self, station: StationRecord) -> str:
+        return self._station_list.get_card(station)
+
+    def for_state(self, state: StationState) -> StationView:
+        if state is self._state:
+            return self
+
+        return StationView(state, station_list=self._station_list)
+
+    def warm_up(self) -> None:
+        """
+        Builds the lookup structures that are otherwise built lazily on first use.
+        """
+        self._station_list.warm_up()
+
+    def random_open_station(self) -> StationRecord | None:
+        return self._open_stations.choice()
+
+    def apply_done(
+        self,
+        state: StationState,
+        stations: Sequence[StationRecord],
+    ) -> None:
+        """
+        Moves the view to state, in which stations were marked as done on top of the
+        view's current state.
+
+        Unlike for_state(), this only updates the given stations. The view is shared,
+        so this must only be called once state was stored.
+        """
+        for station in stations:
+            self._open_stations.discard(station.name)
+            if self._station_list.get_station(station.name):
+                link = self._station_list.get_link(station)
+                self._progress_lines.add(
+                    station.name,
+                    format_progress_line(
+                        link, state.done_date_by_station_name[station.name]
+                    ),
+                )
+        self._state = state
+
+    def mark_undone(self, station_name: str) -> StationState:
+        state = self._state.mark_undone(station_name)
+        if station := self._station_list.get_station(station_name):
+            self._open_stations.add(station)
+        self._progress_lines.remove(station_name)
+
+        self._state = state
+        return state
@@ -1,25 +1,183 @@
 import asyncio
 import logging
+import re
+import time
 import unicodedata
-from typing import TYPE_CHECKING, overload
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any, overload
 from urllib.robotparser import RobotFileParser
 
 import httpx
+import sentry_sdk
 from bs4 import BeautifulSoup, Tag
 from httpx import URL
-from pydantic import (
-    HttpUrl,
-)
+from pydantic import TypeAdapter, ValidationError
 
-from bot.model import Route, Station, StationType, StopType
+from bot import metrics
+from bot.config import ParseExecutorType
+from bot.model import CacheValidators, RobotsCache, Station, StationType, StopType
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Mapping
 
-    from bot.config import UserAgentConfig
+    from bs_state import StateStorage
+
+    from bot.config import UserAgentConfig, WikiConfig
+    from bot.state import StateStorageFactory
 
 _logger = logging.getLogger(__name__)
 
+# Must be incremented whenever a change to the parser changes its output
+PARSER_VERSION = 1
+
+# The fields of a Station as plain, picklable data
+type StationData = dict[str, Any]
+
+_STATIONS_ADAPTER = TypeAdapter(list[Station])
+
+
+def validate_stations(data: list[StationData]) -> list[Station]:
+    try:
+        return _STATIONS_ADAPTER.validate_python(data)
+    except ValidationError as e:
+        _logger.warning("Bulk validation failed, validating stations one by one: %s", e)
+
+    stations = []
+    for station_data in data:
+        try:
+            stations.append(Station.model_validate(station_data))
+        except ValidationError as e:
+            _logger.warning("Skipping invalid station %s", station_data, exc_info=e)
+
+    return stations
+
+
+def _parse_station_table(url: str, table_html: str | None) -> list[Station] | None:
+    # Runs in an executor, possibly in another process
+    return _StationParser(URL(url)).parse_table(table_html)
+
+
+# The tags the table scanner needs to see. The lookahead makes sure a tag name that
+# was cut off at the end of a chunk isn't mistaken for a complete one.
+_SCANNED_TAG = re.compile(r"<!--|<(/?)(table|script|style)(?=[\s/>])", re.IGNORECASE)
+_END_OF_COMMENT = re.compile("-->")
+_END_OF_RAW_TEXT = {
+    "script": re.compile(r"</script(?=[\s/>])", re.IGNORECASE),
+    "style": re.compile(r"</style(?=[\s/>])", re.IGNORECASE),
+}
+# Enough to complete any of the patterns above in the next chunk
+_SCAN_OVERLAP = len("</script")
+
+
+class _TableScanner:
+    """
+    Incrementally finds the markup of the first table in an HTML document.
+
+    The document can be fed in chunks. Once the table is complete, any further input
+    is ignored, so no time is spent on the rest of the page.
+
+    Only comments, scripts, styles and table tags are looked at, using regular
+    expressions, so the document isn't tokenized. BeautifulSoup tokenizes the table
+    markup when it builds the tree.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        # Offset of the pending text in the document
+        self._offset = 0
+        # The end of the fed text, which might contain the start of a tag
+        self._pending = ""
+        # "comment", "script" or "style" while inside of one
+        self._context: str | None = None
+        self._depth = 0
+        self._start: int | None = None
+        self._end: int | None = None
+
+    @property
+    def is_complete(self) -> bool:
+        return self._end is not None
+
+    @property
+    def table_html(self) -> str | None:
+        start = self._start
+        if start is None:
+            return None
+
+        # If the document ended early, BeautifulSoup closes the open tags
+        return "".join(self._chunks)[start : self._end]
+
+    def feed(self, data: str) -> None:
+        if self._end is not None:
+            return
+
+        self._chunks.append(data)
+        text = self._pending + data
+        position = self._scan(text)
+        self._offset += position
+        self._pending = text[position:]
+
+    def _scan(self, text: str) -> int:
+        """
+        Scans text, which starts at self._offset in the document.
+
+        Returns:
+            The position up to which the text was consumed.
+        """
+        position = 0
+        while True:
+            context = self._context
+            if context is not None:
+                pattern = (
+                    _END_OF_COMMENT
+                    if context == "comment"
+                    else _END_OF_RAW_TEXT[context]
+                )
+                match = pattern.search(text, position)
+                if match is None:
+                    return max(position, len(text) - _SCAN_OVERLAP)
+
+                self._context = None
+                position = match.end()
+                continue
+
+            match = _SCANNED_TAG.search(text, position)
+            if match is None:
+                return max(position, len(text) - _SCAN_OVERLAP)
+
+            position = match.end()
+            is_end_tag, tag = match.group(1), match.group(2)
+            if tag is None:
+                self._context = "comment"
+                continue
+
+            tag = tag.lower()
+            if tag != "table":
+                if not is_end_tag:
+                    self._context = tag
+                continue
+
+            if not is_end_tag:
+                if self._start is None:
+                    self._start = self._offset + match.start()
+                self._depth += 1
+                continue
+
+            if not self._depth:
+                continue
+
+            tag_end = text.find(">", position)
+            if tag_end == -1:
+                # Scan the end tag again once it is complete
+                return match.start()
+
+            position = tag_end + 1
+            self._depth -= 1
+            if not self._depth:
+                self._end = self._offset + position
+                return position
+
 
 # noinspection PyMethodMayBeStatic
 class _StationParser:
@@ -27,7 +185,32 @@ class _StationParser:
         self.requested_url = url
 
     def parse_stations(self, raw_wiki_page: str) -> list[Station] | None:
-        soup = BeautifulSoup(raw_wiki_page, "html.parser")
+        scanner = _TableScanner()
+        scanner.feed(raw_wiki_page)
+        return self.parse_table(scanner.table_html)
+
+    def parse_table(self, table_html: str | None) -> list[Station] | None:
+        data = self.parse_table_data(table_html)
+        if data is None:
+            return None
+
+        return validate_stations(data)
+
+    def parse_soup(self, soup: BeautifulSoup) -> list[Station] | None:
+        data = self.parse_soup_data(soup)
+        if data is None:
+            return None
+
+        return validate_stations(data)
+
+    def parse_table_data(self, table_html: str | None) -> list[StationData] | None:
+        if table_html is None:
+            _logger.error("No tables found on page")
+            return None
+
+        return self.parse_soup_data(BeautifulSoup(table_html, "html.parser"))
+
+    def parse_soup_data(self, soup: BeautifulSoup) -> list[StationData] | None:
         tables = soup.find_all("table")
         if not tables:
             _logger.error("No tables found on page")
@@ -52,7 +235,7 @@ class _StationParser:
 
         return stations
 
-    def _parse_station(self, row: Tag) -> Station | None:
+    def _parse_station(self, row: Tag) -> StationData | None:
         columns: list[Tag] = row.find_all("td")
         if len(columns) < 13:  # Ensure we have enough columns
             _logger.error("Encountered row with too few columns: %s", row)
@@ -60,10 +243,10 @@ class _StationParser:
 
         tracks_str = self._normalize_blank_string(columns[2].string)
 
-        return Station(
+        return dict(
             name=self._get_station_name(columns[0]),
             name_link=self._get_link(columns[0]),
-            type=self._parse_type(columns[1]),
+            type=self._parse_type(columns[1]).value,
             tracks=int(tracks_str) if tracks_str else None,
             town=self._normalize_unicode_string(
                 " ".join(self._filter_blank_strings(columns[3].strings)) or None
@@ -73,13 +256,14 @@ class _StationParser:
             opening=self._parse_opening_date(columns[5]),
             transport_association=self._normalize_blank_string(columns[6].string),
             category=self._normalize_blank_string(columns[7].string),
-            stop_types=frozenset(
-                StopType.from_columns(
+            stop_types=[
+                stop_type.value
+                for stop_type in StopType.from_columns(
                     self._normalize_blank_string(columns[8].string),
                     self._normalize_blank_string(columns[9].string),
                     self._normalize_blank_string(columns[10].string),
                 )
-            ),
+            ],
             routes=self._parse_routes(columns[11]),
             notes=self._normalize_unicode_string(
                 " ".join(self._filter_blank_strings(columns[12].strings))
@@ -137,7 +321,7 @@ class _StationParser:
 
         return text
 
-    def _parse_route(self, a_tag: Tag) -> Route:
+    def _parse_route(self, a_tag: Tag) -> StationData:
         link = a_tag.attrs.get("href", "")
         cls = a_tag.attrs.get("class", "")
 
@@ -145,18 +329,14 @@ class _StationParser:
         if not link or "new" in cls:
             url = None
         else:
-            url = HttpUrl(str(self.requested_url.join(link)))
-
-        return Route(name=a_tag.text, link=url)
+            url = str(self.requested_url.join(link))
 
-    def _parse_routes(self, route_tag: Tag) -> frozenset[Route]:
-        routes = set()
-        for a in route_tag.find_all("a"):
-            routes.add(self._parse_route(a))
+        return dict(name=a_tag.text, link=url)
 
-        return frozenset(routes)
+    def _parse_routes(self, route_tag: Tag) -> list[StationData]:
+        return [self._parse_route(a) for a in route_tag.find_all("a")]
 
-    def _get_link(self, t: Tag) -> HttpUrl | None:
+    def _get_link(self, t: Tag) -> str | None:
         a = t.find("a")
         if not isinstance(a, Tag):
             return None
@@ -167,7 +347,7 @@ class _StationParser:
         if "new" in cls:
             return None
 
-        return HttpUrl(str(self.requested_url.join(link)))
+        return str(self.requested_url.join(link))
 
     def _get_station_name(self, t: Tag) -> str:
         link_tags = t.find_all("a")
@@ -179,6 +359,62 @@ class _StationParser:
         return "".join(strings)
 
 
+def _get_validators(
+    response: httpx.Response,
+    previous: CacheValidators | None = None,
+) -> CacheValidators | None:
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if previous is not None:
+        etag = etag or previous.etag
+        last_modified = last_modified or previous.last_modified
+
+    if etag is None and last_modified is None:
+        return None
+
+    return CacheValidators(
+        etag=etag,
+        last_modified=last_modified,
+        parser_version=PARSER_VERSION,
+    )
+
+
+@dataclass(frozen=True, kw_only=True)
+class StationPage:
+    # None if the page was not modified since the last fetch
+    stations: list[Station] | None
+    validators: CacheValidators | None
+
+
+@dataclass(frozen=True, kw_only=True)
+class StationPages:
+    # Stations of all modified pages, None if no page was modified
+    stations: list[Station] | None
+    # Validators of all pages that were fetched successfully, keyed by URL path
+    validators: dict[str, CacheValidators]
+    # False if at least one page could not be fetched
+    complete: bool
+
+
+class _HostRateLimiter:
+    """
+    Spaces out the starts of requests to the same host by a minimum interval.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._next_start_by_host: dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next_start_by_host.get(host, now))
+        # Reserve the slot before sleeping, so concurrent callers queue up behind it
+        self._next_start_by_host[host] = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
 class _RobotInfo:
     def __init__(
         self,
@@ -199,32 +435,173 @@ class _RobotInfo:
 
 
 class WikipediaClient:
-    def __init__(self, config: UserAgentConfig) -> None:
+    def __init__(
+        self,
+        user_agent: UserAgentConfig,
+        config: WikiConfig,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        robots_storage_factory: StateStorageFactory[RobotsCache] | None = None,
+    ) -> None:
         self._base_url = "https://de.wikipedia.org"
-        self._user_agent = config.build_header_value()
+        self._transport = transport
+        self._user_agent = user_agent.build_header_value()
+        self._config = config
         self._robots_lock = asyncio.Lock()
-        self._robots_loaded = asyncio.Event()
+        self._robots_storage_factory = robots_storage_factory
+        self._robots_storage: StateStorage[RobotsCache] | None = None
+        self._robots_cache: RobotsCache | None = None
         self._robots: _RobotInfo | None = None
+        self._executor: Executor | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._request_semaphore = asyncio.Semaphore(config.max_concurrent_requests)
+        self._rate_limiter = _HostRateLimiter(config.request_interval_ms / 1000)
+
+    def _get_executor(self) -> Executor:
+        executor = self._executor
+        if executor is None:
+            config = self._config
+            if config.parse_executor == ParseExecutorType.PROCESS:
+                executor = ProcessPoolExecutor(max_workers=config.parse_workers)
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=config.parse_workers,
+                    thread_name_prefix="wiki-parser",
+                )
+            self._executor = executor
+
+        return executor
+
+    async def close(self) -> None:
+        executor = self._executor
+        if executor is not None:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        client = self._client
+        if client is not None:
+            self._client = None
+            await client.aclose()
+
+        robots_storage = self._robots_storage
+        if robots_storage is not None:
+            self._robots_storage = None
+            await robots_storage.close()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        client = self._client
+        if client is None:
+            client = self._create_client()
+            self._client = client
+
+        return client
 
     def _create_client(self) -> httpx.AsyncClient:
+        config = self._config
         return httpx.AsyncClient(
             base_url=self._base_url,
+            transport=self._transport,
             headers={
                 "User-Agent": self._user_agent,
             },
+            http2=config.http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry_seconds,
+            ),
+            timeout=httpx.Timeout(
+                config.timeout_seconds,
+                connect=config.connect_timeout_seconds,
+            ),
         )
 
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(UTC)
+
     async def _get_robots(self) -> _RobotInfo | None:
-        if self._robots_loaded.is_set():
+        cache = self._robots_cache
+        if cache is not None and cache.is_fresh(self._now()):
             return self._robots
 
         async with self._robots_lock:
-            try:
-                robots = await self._load_robots()
+            cache = self._robots_cache
+            if cache is None:
+                cache = await self._load_robots_cache()
+                self._robots = self._parse_robots(cache.content)
+                self._robots_cache = cache
+
+            if cache.is_fresh(self._now()):
+                return self._robots
+
+            content = await self._fetch_robots()
+            robots = None if content is None else self._parse_robots(content)
+            cache = self._update_robots_cache(cache, content, robots is not None)
+            if robots is not None:
                 self._robots = robots
-                return robots
-            finally:
-                self._robots_loaded.set()
+            elif self._robots is not None:
+                _logger.warning("Using stale robots.txt until the next attempt")
+
+            self._robots_cache = cache
+            await self._store_robots_cache(cache)
+            return self._robots
+
+    def _update_robots_cache(
+        self,
+        cache: RobotsCache,
+        content: str | None,
+        success: bool,
+    ) -> RobotsCache:
+        config = self._config
+        now = self._now()
+
+        if success:
+            return RobotsCache(
+                content=content,
+                expires_at=now + timedelta(seconds=config.robots_ttl_seconds),
+                failures=0,
+            )
+
+        failures = cache.failures + 1
+        backoff = min(
+            config.robots_min_backoff_seconds * 2 ** (failures - 1),
+            config.robots_max_backoff_seconds,
+        )
+        _logger.info("Retrying robots.txt in %d seconds", backoff)
+        return RobotsCache(
+            content=cache.content,
+            expires_at=now + timedelta(seconds=backoff),
+            failures=failures,
+        )
+
+    async def _load_robots_cache(self) -> RobotsCache:
+        factory = self._robots_storage_factory
+        if factory is None:
+            return RobotsCache.empty()
+
+        try:
+            storage = await factory(RobotsCache.empty())
+            self._robots_storage = storage
+            cache = await storage.load()
+        except Exception as e:
+            _logger.error("Could not load robots.txt cache", exc_info=e)
+            return RobotsCache.empty()
+
+        if cache.is_fresh(self._now()):
+            _logger.info("Using cached robots.txt")
+
+        return cache
+
+    async def _store_robots_cache(self, cache: RobotsCache) -> None:
+        storage = self._robots_storage
+        if storage is None:
+            return
+
+        try:
+            await storage.store(cache)
+        except Exception as e:
+            _logger.error("Could not store robots.txt cache", exc_info=e)
 
     async def get_wiki_stations(self) -> list[Station] | None:
         """
@@ -233,63 +610,189 @@ class WikipediaClient:
         Returns:
             List of Station objects or None if the request failed.
         """
-        robots = await self._get_robots()
+        pages = await self.fetch_stations()
+        if pages is None:
+            return None
+
+        return pages.stations
+
+    async def fetch_stations(
+        self,
+        validators: Mapping[str, CacheValidators] | None = None,
+    ) -> StationPages | None:
+        """
+        Asynchronously fetch and parse the stations of all configured list pages.
+
+        Pages are fetched concurrently. Pages that weren't modified since the given
+        validators (keyed by URL path) were issued are not parsed again.
+
+        Returns:
+            The stations of all modified pages, or None if no page could be fetched.
+        """
+        with sentry_sdk.start_span(op="wiki.robots", name="Get robots.txt"):
+            robots = await self._get_robots()
 
         if robots is None:
             _logger.warning("No robots info, so not requesting page")
             return None
 
-        url_path = "/wiki/Liste_der_Personenbahnh%C3%B6fe_in_Schleswig-Holstein"
+        if validators is None:
+            validators = {}
+
+        url_paths = self._config.page_paths
+        pages = await asyncio.gather(
+            *(
+                self._fetch_allowed_page(robots, url_path, validators.get(url_path))
+                for url_path in url_paths
+            )
+        )
+
+        stations: list[Station] | None = None
+        new_validators: dict[str, CacheValidators] = {}
+        complete = True
+        for url_path, page in zip(url_paths, pages, strict=True):
+            if page is None:
+                complete = False
+                continue
+
+            if page.validators is not None:
+                new_validators[url_path] = page.validators
+
+            if page.stations is not None:
+                if stations is None:
+                    stations = []
+                stations.extend(page.stations)
+
+        if all(page is None for page in pages):
+            return None
+
+        return StationPages(
+            stations=stations,
+            validators=new_validators,
+            complete=complete,
+        )
+
+    async def _fetch_allowed_page(
+        self,
+        robots: _RobotInfo,
+        url_path: str,
+        validators: CacheValidators | None,
+    ) -> StationPage | None:
         if not robots.can_request(url_path):
-            _logger.error("Not allowed to request page")
+            _logger.error("Not allowed to request page %s", url_path)
             return None
 
-        async with self._create_client() as client:
-            try:
-                response = await client.get(
-                    url_path,
-                    headers={
-                        "Accept": "text/html",
-                    },
-                )
-            except httpx.RequestError:
-                _logger.exception("Could not fetch stations")
-                return None
-
-            if not response.is_success:
-                _logger.error(
-                    "Received unsuccessful response from Wikipedia: %d",
-                    response.status_code,
-                )
-                _logger.error(response.text)
-                return None
-
-            parser = _StationParser(response.url)
-            return parser.parse_stations(response.text)
-
-    async def _load_robots(self) -> _RobotInfo | None:
-        async with self._create_client() as client:
-            try:
-                response = await client.get("/robots.txt")
-            except httpx.RequestError as e:
-                _logger.error("Could not fetch robots.txt", exc_info=e)
-                return None
-
-            if not response.is_success:
-                _logger.error(
-                    "Unsuccessful robots.txt repsonse %d", response.status_code
-                )
-                return None
-
-            parser = RobotFileParser()
-            try:
-                parser.parse(response.iter_lines())
-            except ValueError as e:
-                _logger.error("Could not parse robots.txt", exc_info=e)
-                return None
-
-            return _RobotInfo(
-                base_url=self._base_url,
-                parser=parser,
-                user_agent=self._user_agent,
+        async with self._request_semaphore:
+            await self._rate_limiter.wait(self._get_client().base_url.host)
+            return await self.fetch_page(url_path, validators)
+
+    async def fetch_page(
+        self,
+        url_path: str,
+        validators: CacheValidators | None = None,
+    ) -> StationPage | None:
+        """
+        Asynchronously fetch and parse the stations of a single list page, unless the
+        page wasn't modified since the given validators were issued.
+
+        This doesn't check robots.txt or apply any rate limiting.
+
+        Returns:
+            The fetched page, or None if the request failed.
+        """
+        client = self._get_client()
+        span = sentry_sdk.start_span(op="wiki.fetch", name=f"GET {url_path}")
+        start = time.perf_counter()
+        result = "error"
+        try:
+            headers = {"Accept": "text/html"}
+            if validators is not None:
+                headers.update(validators.to_request_headers())
+
+            async with client.stream("GET", url_path, headers=headers) as response:
+                if response.status_code == httpx.codes.NOT_MODIFIED:
+                    _logger.info("Station page %s was not modified", url_path)
+                    result = "not_modified"
+                    return StationPage(
+                        stations=None,
+                        validators=_get_validators(response, validators),
+                    )
+
+                if not response.is_success:
+                    await response.aread()
+                    _logger.error(
+                        "Received unsuccessful response from Wikipedia: %d",
+                        response.status_code,
+                    )
+                    _logger.error(response.text)
+                    return None
+
+                # The station table is near the top of the page, so we stop
+                # reading as soon as it is complete. The scanner only looks for
+                # table tags, the markup is parsed in the executor.
+                scanner = _TableScanner()
+                async for chunk in response.aiter_text():
+                    scanner.feed(chunk)
+                    if scanner.is_complete:
+                        break
+                result = "success"
+        except httpx.RequestError:
+            _logger.exception("Could not fetch stations from %s", url_path)
+            return None
+        finally:
+            span.set_data("result", result)
+            span.finish()
+            metrics.WIKI_FETCH_DURATION.labels(result=result).observe(
+                time.perf_counter() - start
+            )
+
+        # Parsing and validation are CPU-bound, so they must not block the event loop
+        with (
+            sentry_sdk.start_span(op="wiki.parse", name="Parse station table"),
+            metrics.WIKI_PARSE_DURATION.time(),
+        ):
+            stations = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(),
+                _parse_station_table,
+                str(response.url),
+                scanner.table_html,
             )
+        if stations is None:
+            return None
+
+        return StationPage(
+            stations=stations,
+            validators=_get_validators(response),
+        )
+
+    async def _fetch_robots(self) -> str | None:
+        client = self._get_client()
+        await self._rate_limiter.wait(client.base_url.host)
+        try:
+            response = await client.get("/robots.txt")
+        except httpx.RequestError as e:
+            _logger.error("Could not fetch robots.txt", exc_info=e)
+            return None
+
+        if not response.is_success:
+            _logger.error("Unsuccessful robots.txt repsonse %d", response.status_code)
+            return None
+
+        return response.text
+
+    def _parse_robots(self, content: str | None) -> _RobotInfo | None:
+        if content is None:
+            return None
+
+        parser = RobotFileParser()
+        try:
+            parser.parse(content.splitlines())
+        except ValueError as e:
+            _logger.error("Could not parse robots.txt", exc_info=e)
+            return None
+
+        return _RobotInfo(
+            base_url=self._base_url,
+            parser=parser,
+            user_agent=self._user_agent,
+        )
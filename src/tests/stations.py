@@ -0,0 +1,82 @@
+from bot.model import StationRecord, StationType
+
+# A station list page with two stations in the first table
+STATION_LIST_PAGE = """<!DOCTYPE html>
+<html><head>
+<script>var config = {"example": "<table><tr><td>nope</td></tr></table>"};</script>
+</head><body>
+<p>Intro &amp; more</p>
+<table class="wikitable">
+<tbody><tr><th>Name</th><th>Art</th></tr>
+<tr>
+<td><a href="/wiki/Kiel_Hbf" title="Kiel Hbf">Kiel Hbf</a></td>
+<td>Bf</td>
+<td>8</td>
+<td><a href="/wiki/Kiel">Kiel</a></td>
+<td>KI</td>
+<td>9.&#160;Jun. 1907</td>
+<td>NAH.SH</td>
+<td>2</td>
+<td>F</td>
+<td>R</td>
+<td></td>
+<td><a href="/wiki/Strecke_A">Strecke A</a>,
+<a href="/w/index.php?title=B&amp;redlink=1" class="new">Strecke B</a></td>
+<td>Umbau<br/>geplant<sup class="reference"><a href="#cite_note-1">[1]</a></sup></td>
+</tr>
+<tr>
+<td>Hp Nord</td>
+<td>Hp</td>
+<td></td>
+<td>Irgendwo</td>
+<td>RD</td>
+<td>1990</td>
+<td></td>
+<td></td>
+<td></td>
+<td>R</td>
+<td>S</td>
+<td></td>
+<td></td>
+</tr>
+</tbody></table>
+<table><tbody><tr><td>Navigation</td></tr></tbody></table>
+</body></html>
+"""
+
+
+def create_station(
+    name: str,
+    *,
+    link: str | None = None,
+    tracks: int | None = None,
+) -> StationRecord:
+    return StationRecord(
+        name=name,
+        name_link=link,
+        type=StationType.BAHNHOF,
+        tracks=tracks,
+        town=None,
+        town_link=None,
+        district="Test District",
+        opening=None,
+        transport_association=None,
+        category=None,
+        stop_types=frozenset(),
+        routes=frozenset(),
+        notes="",
+    )
+
+
+class MemoryStorage[T]:
+    def __init__(self, state: T) -> None:
+        self.state = state
+
+    async def load(self) -> T:
+        return self.state
+
+    async def store(self, state: T) -> None:
+        self.state = state
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,521 @@
+import asyncio
+import json
+from dataclasses import replace
+from datetime import UTC, date, datetime
+from typing import TYPE_CHECKING, Any
+
+import httpx
+import pytest
+import pytest_asyncio
+from telegram import Update
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest
+
+from bot.bot import StationBot, _split_queries
+from bot.config import Config, StartupMode
+from bot.model import CacheValidators
+from bot.snapshot import StationSnapshot, store_snapshot
+from bot.state import StateConflictException, StationState
+from bot.wiki import PARSER_VERSION
+from tests.stations import STATION_LIST_PAGE, MemoryStorage, create_station
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+_ETAG = '"v1"'
+
+
+class _FakeTelegram(BaseRequest):
+    """Answers Bot API calls locally and records the sent texts."""
+
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+        self.answered_queries = 0
+        # The text and reply markup of every sent message, by message ID
+        self._messages: dict[int, tuple[str, object]] = {}
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Any = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+        result: object
+        if endpoint == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Station Bot",
+                "username": "station_bot",
+            }
+        elif endpoint == "answerCallbackQuery":
+            self.answered_queries += 1
+            result = True
+        else:
+            text = parameters.get("text", "")
+            content = (text, parameters.get("reply_markup"))
+            if endpoint == "editMessageText":
+                message_id = parameters["message_id"]
+                if self._messages.get(message_id) == content:
+                    return 400, json.dumps(
+                        {
+                            "ok": False,
+                            "error_code": 400,
+                            "description": "Bad Request: message is not modified",
+                        }
+                    ).encode("utf-8")
+            else:
+                message_id = len(self._messages) + 1
+
+            self._messages[message_id] = content
+            self.texts.append(text)
+            result = {
+                "message_id": message_id,
+                "date": 0,
+                "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+                "text": text,
+            }
+
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def get_markup(self, message_id: int) -> object:
+        return self._messages[message_id][1]
+
+
+class _FakeWikipedia:
+    def __init__(self) -> None:
+        self.page_requests: list[httpx.Request] = []
+        # Page requests wait until this is set
+        self.available = asyncio.Event()
+        self.available.set()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text="User-agent: *\nAllow: /\n")
+
+        self.page_requests.append(request)
+        await self.available.wait()
+        if request.headers.get("If-None-Match") == _ETAG:
+            return httpx.Response(304, headers={"ETag": _ETAG})
+
+        return httpx.Response(200, text=STATION_LIST_PAGE, headers={"ETag": _ETAG})
+
+
+class _ConflictingStorage(MemoryStorage[StationState]):
+    """A storage that is always changed concurrently by someone else."""
+
+    async def compare_and_store(self, state: StationState) -> None:
+        raise StateConflictException()
+
+
+class _Harness:
+    def __init__(self, config: Config) -> None:
+        self.config = replace(
+            config,
+            metrics=None,
+            snapshot_path=None,
+            startup_mode=StartupMode.BLOCKING,
+            state=None,
+            wiki=replace(config.wiki, request_interval_ms=0),
+        )
+        self.storage = MemoryStorage(StationState.empty())
+        self.telegram = _FakeTelegram()
+        self.wikipedia = _FakeWikipedia()
+        self.app: Application | None = None
+        self.errors: list[BaseException] = []
+
+    async def start(self) -> None:
+        async def create_storage(initial: StationState) -> MemoryStorage[StationState]:
+            return self.storage
+
+        app = StationBot.build_application(
+            self.config,
+            create_storage,  # type: ignore[arg-type]
+            bot=ExtBot("1:test", request=self.telegram),
+            wiki_transport=httpx.MockTransport(self.wikipedia.handle),
+        )
+        app.add_error_handler(self._record_error)
+        await app.initialize()
+        self.app = app
+        assert app.post_init
+        await app.post_init(app)
+
+    async def _record_error(self, update: object, context: Any) -> None:
+        self.errors.append(context.error)
+
+    async def _process(self, update_data: dict[str, Any]) -> list[str]:
+        app = self.app
+        assert app is not None
+
+        update = Update.de_json({"update_id": 1, **update_data}, app.bot)
+        sent = len(self.telegram.texts)
+        await app.process_update(update)
+        return self.telegram.texts[sent:]
+
+    @staticmethod
+    def _message(message_id: int = 1, **fields: Any) -> dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "date": int(datetime(2024, 3, 1, 12, tzinfo=UTC).timestamp()),
+            "chat": {"id": 1, "type": "group"},
+            "from": {"id": 1, "is_bot": False, "first_name": "A"},
+            **fields,
+        }
+
+    async def send(self, text: str) -> list[str]:
+        """Sends a message to the bot and returns the texts of its replies."""
+        command = text.split(maxsplit=1)[0]
+        entity = {"type": "bot_command", "offset": 0, "length": len(command)}
+        return await self._process(
+            {"message": self._message(text=text, entities=[entity])}
+        )
+
+    async def send_photo(self, caption: str | None) -> list[str]:
+        """Sends a photo to the bot and returns the texts of its replies."""
+        photo = {"file_id": "photo", "file_unique_id": "photo", "width": 1, "height": 1}
+        message = self._message(photo=[photo])
+        if caption is not None:
+            message["caption"] = caption
+
+        return await self._process({"message": message})
+
+    async def press(self, message_id: int, data: str) -> list[str]:
+        """
+        Presses an inline keyboard button of a sent message and returns the texts
+        the bot sent or edited.
+        """
+        return await self._process(
+            {
+                "callback_query": {
+                    "id": "1",
+                    "from": {"id": 1, "is_bot": False, "first_name": "A"},
+                    "chat_instance": "1",
+                    "data": data,
+                    "message": self._message(message_id, text=""),
+                }
+            }
+        )
+
+    async def stop(self) -> None:
+        app = self.app
+        if app is None:
+            return
+
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+@pytest_asyncio.fixture
+async def harness(config):
+    harness = _Harness(config)
+    yield harness
+    await harness.stop()
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        ("Kiel Hbf", ["Kiel Hbf"]),
+        ("Kiel Hbf, Hp Nord", ["Kiel Hbf", "Hp Nord"]),
+        ("Kiel Hbf\nHp Nord\n", ["Kiel Hbf", "Hp Nord"]),
+        (" , Kiel Hbf,,\n ", ["Kiel Hbf"]),
+        (" , ", []),
+    ],
+)
+def test_split_queries(query, expected):
+    assert _split_queries(query) == expected
+
+
+class TestDone:
+    @pytest.mark.asyncio
+    async def test_single(self, harness):
+        await harness.start()
+
+        assert await harness.send("/done Kiel Hbf") == [
+            "Der Bahnhof Kiel Hbf wurde als besucht markiert."
+        ]
+        assert await harness.send("/done kiel hbf") == [
+            "Der Bahnhof Kiel Hbf wurde schon am 01.03.2024 besucht."
+        ]
+        assert await harness.send("/done Kiel Nord") == [
+            "Sorry, das konnte ich nicht zuordnen. Meintest du <code>Hp Nord</code>?"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_many(self, harness):
+        await harness.start()
+        await harness.send("/done Kiel Hbf")
+
+        assert await harness.send("/done Hp Nord, Kiel Hbf\nKiel Nord") == [
+            "Als besucht markiert:\n"
+            "- Hp Nord\n"
+            "\n"
+            "Schon besucht:\n"
+            "- Kiel Hbf (01.03.2024)\n"
+            "\n"
+            "Nicht zugeordnet:\n"
+            "- Kiel Nord (meintest du <code>Hp Nord</code>?)"
+        ]
+        assert set(harness.storage.state.done_date_by_station_name) == {
+            "Kiel Hbf",
+            "Hp Nord",
+        }
+
+    @pytest.mark.asyncio
+    async def test_photo_caption_is_not_split(self, harness):
+        await harness.start()
+
+        assert await harness.send_photo("Hp Nord, Gleis 1") == [
+            "Sorry, das konnte ich nicht zuordnen. Meintest du <code>Hp Nord</code>?"
+        ]
+        assert not harness.storage.state.done_date_by_station_name
+
+    @pytest.mark.asyncio
+    async def test_photo_without_caption(self, harness):
+        await harness.start()
+
+        assert await harness.send_photo(None) == []
+
+
+class TestProgress:
+    @pytest_asyncio.fixture
+    async def started(self, harness):
+        state = StationState.empty().update_stations(
+            [create_station(f"Bahnhof Nummer {index:04d}") for index in range(600)]
+        )
+        harness.storage.state = state.mark_many_as_done(
+            state.stations, date(2024, 3, 1)
+        )
+        # Keeps the refresh from changing the station list
+        harness.config = replace(harness.config, startup_mode=StartupMode.BACKGROUND)
+        harness.wikipedia.available.clear()
+        await harness.start()
+        return harness
+
+    @staticmethod
+    def _buttons(harness: _Harness, message_id: int) -> list[str]:
+        markup = harness.telegram.get_markup(message_id)
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        assert isinstance(markup, dict)
+        return [button["text"] for button in markup["inline_keyboard"][0]]
+
+    @pytest.mark.asyncio
+    async def test_next_and_previous(self, started):
+        [first_page] = await started.send("/progress")
+        assert first_page.startswith("600 / 600")
+        page_count = int(self._buttons(started, 1)[0].split(" / ")[1])
+        assert page_count > 2
+
+        [second_page] = await started.press(1, "progress:1")
+        assert second_page != first_page
+        assert self._buttons(started, 1) == ["«", f"2 / {page_count}", "»"]
+
+        assert await started.press(1, "progress:0") == [first_page]
+        assert self._buttons(started, 1) == [f"1 / {page_count}", "»"]
+        assert started.telegram.answered_queries == 2
+
+    @pytest.mark.asyncio
+    async def test_out_of_range_page(self, started):
+        await started.send("/progress")
+        page_count = int(self._buttons(started, 1)[0].split(" / ")[1])
+
+        assert len(await started.press(1, "progress:99")) == 1
+        assert self._buttons(started, 1) == ["«", f"{page_count} / {page_count}"]
+
+    @pytest.mark.asyncio
+    async def test_unchanged_page(self, started):
+        await started.send("/progress")
+
+        # Pressing the button of the current page again doesn't change the message
+        assert await started.press(1, "progress:0") == []
+        assert await started.press(1, "progress:current") == []
+
+        assert started.telegram.answered_queries == 2
+        assert not started.errors
+
+
+class TestRefresh:
+    @staticmethod
+    def _parsed_state(path: str, parser_version: int) -> StationState:
+        return (
+            StationState.empty()
+            .update_stations([create_station("Kiel Hbf")])
+            .with_wiki_validators(
+                {
+                    path: CacheValidators(
+                        etag=_ETAG,
+                        last_modified=None,
+                        parser_version=parser_version,
+                    )
+                }
+            )
+        )
+
+    @pytest.mark.asyncio
+    async def test_not_modified(self, harness):
+        harness.storage.state = self._parsed_state(
+            harness.config.wiki.page_paths[0],
+            PARSER_VERSION,
+        )
+
+        await harness.start()
+
+        assert harness.wikipedia.page_requests[0].headers["If-None-Match"] == _ETAG
+        names = {station.name for station in harness.storage.state.stations}
+        assert "Hp Nord" not in names
+
+    @pytest.mark.asyncio
+    async def test_parser_version_changed(self, harness):
+        harness.storage.state = self._parsed_state(
+            harness.config.wiki.page_paths[0],
+            PARSER_VERSION - 1,
+        )
+
+        await harness.start()
+
+        assert "If-None-Match" not in harness.wikipedia.page_requests[0].headers
+        state = harness.storage.state
+        assert "Hp Nord" in {station.name for station in state.stations}
+        assert [
+            validators.parser_version for validators in state.wiki_validators.values()
+        ] == [PARSER_VERSION]
+
+
+class TestStartup:
+    @pytest.mark.asyncio
+    async def test_blocking(self, harness):
+        await harness.start()
+
+        assert len(harness.wikipedia.page_requests) == 1
+        assert await harness.send("/done Hp Nord") == [
+            "Der Haltepunkt Hp Nord wurde als besucht markiert."
+        ]
+
+    @pytest.mark.asyncio
+    async def test_background_serves_stored_state(self, harness):
+        harness.config = replace(harness.config, startup_mode=StartupMode.BACKGROUND)
+        harness.storage.state = StationState.empty().update_stations(
+            [create_station("Kiel Hbf")]
+        )
+        harness.wikipedia.available.clear()
+
+        await harness.start()
+
+        assert await harness.send("/done Kiel Hbf") == [
+            "Der Bahnhof Kiel Hbf wurde als besucht markiert."
+        ]
+        # The refresh is still waiting for Wikipedia
+        assert "Hp Nord" not in {
+            station.name for station in harness.storage.state.stations
+        }
+
+        harness.wikipedia.available.set()
+        for _ in range(100):
+            if len(harness.storage.state.stations) > 1:
+                break
+            await asyncio.sleep(0.01)
+
+        state = harness.storage.state
+        assert "Hp Nord" in {station.name for station in state.stations}
+        assert "Kiel Hbf" in state.done_date_by_station_name
+
+    @pytest.mark.asyncio
+    async def test_blocking_with_snapshot(self, harness, tmp_path):
+        snapshot_path = tmp_path / "stations.snapshot"
+        store_snapshot(
+            snapshot_path,
+            StationSnapshot(stations=[create_station("Kiel Hbf")], wiki_validators={}),
+            parser_version=PARSER_VERSION,
+        )
+        harness.config = replace(harness.config, snapshot_path=snapshot_path)
+
+        await harness.start()
+
+        # The snapshot replaces the blocking refresh
+        assert not harness.wikipedia.page_requests
+        assert await harness.send("/done Kiel Hbf") == [
+            "Der Bahnhof Kiel Hbf wurde als besucht markiert."
+        ]
+
+    @pytest.mark.asyncio
+    async def test_snapshot_conflict(self, harness, tmp_path):
+        snapshot_path = tmp_path / "stations.snapshot"
+        store_snapshot(
+            snapshot_path,
+            StationSnapshot(stations=[create_station("Kiel Hbf")], wiki_validators={}),
+            parser_version=PARSER_VERSION,
+        )
+        harness.config = replace(harness.config, snapshot_path=snapshot_path)
+        harness.storage = _ConflictingStorage(StationState.empty())
+
+        await harness.start()
+
+        # Startup fell back to refreshing, which ran into the same conflicts
+        assert len(harness.wikipedia.page_requests) == 1
+        assert await harness.send("/station") == ["Keine Stationen geladen."]
+
+    @pytest.mark.asyncio
+    async def test_stored_state_newer_than_snapshot(self, harness, tmp_path):
+        snapshot_path = tmp_path / "stations.snapshot"
+        store_snapshot(
+            snapshot_path,
+            StationSnapshot(
+                stations=[create_station("Kiel Hbf")],
+                wiki_validators={},
+                stations_version=2,
+            ),
+            parser_version=PARSER_VERSION,
+        )
+        harness.config = replace(harness.config, snapshot_path=snapshot_path)
+        stored = (
+            StationState.empty()
+            .update_stations([create_station("Hp Nord")])
+            .with_stations_version(3)
+        )
+        harness.storage.state = stored
+        harness.wikipedia.available.clear()
+
+        await harness.start()
+
+        assert harness.storage.state is stored
+
+    @pytest.mark.asyncio
+    async def test_snapshot_newer_than_stored_state(self, harness, tmp_path):
+        snapshot_path = tmp_path / "stations.snapshot"
+        store_snapshot(
+            snapshot_path,
+            StationSnapshot(
+                stations=[create_station("Kiel Hbf")],
+                wiki_validators={},
+                stations_version=5,
+            ),
+            parser_version=PARSER_VERSION,
+        )
+        harness.config = replace(harness.config, snapshot_path=snapshot_path)
+        harness.storage.state = StationState.empty().update_stations(
+            [create_station("Hp Nord")]
+        )
+        harness.wikipedia.available.clear()
+
+        await harness.start()
+
+        state = harness.storage.state
+        assert {station.name for station in state.stations} >= {"Hp Nord", "Kiel Hbf"}
+        # The applied snapshot doesn't count as newer on the next start
+        assert state.stations_version == 5
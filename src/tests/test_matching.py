@@ -0,0 +1,60 @@
+import pytest
+
+from bot.matching import FuzzyMatchingException, StationMatcher
+from tests.stations import create_station
+
+
+class TestStationMatcher:
+    @pytest.fixture
+    def matcher(self) -> StationMatcher:
+        stations = [
+            create_station("Kiel Hbf"),
+            create_station("Lübeck Hbf"),
+            create_station("Lübeck-Moisling"),
+            create_station("Neumünster"),
+        ]
+        return StationMatcher(stations, version=1)
+
+    @pytest.mark.parametrize(
+        "query,expected",
+        [
+            ("Kiel Hbf", "Kiel Hbf"),
+            ("kiel hbf", "Kiel Hbf"),
+            ("Lübeck-Moisling", "Lübeck-Moisling"),
+            ("lübeck moisling", "Lübeck-Moisling"),
+            ("NEUMÜNSTER!", "Neumünster"),
+        ],
+    )
+    def test_match(self, matcher, query, expected):
+        assert matcher.match(query).name == expected
+
+    def test_no_match(self, matcher):
+        with pytest.raises(FuzzyMatchingException) as e:
+            matcher.match("Lübek")
+
+        assert e.value.closest_match.startswith("Lübeck")
+
+    def test_empty(self):
+        matcher = StationMatcher([], version=0)
+
+        with pytest.raises(ValueError):
+            matcher.match("Kiel")
+
+    def test_match_many(self, matcher):
+        matches = matcher.match_many(["neumünster", "Lübek", "Kiel Hbf"])
+
+        assert [match.query for match in matches] == [
+            "neumünster",
+            "Lübek",
+            "Kiel Hbf",
+        ]
+        assert matches[0].station.name == "Neumünster"
+        assert matches[2].station.name == "Kiel Hbf"
+        assert matches[1].station.name.startswith("Lübeck")
+        assert [match.is_confident for match in matches] == [True, False, True]
+
+    def test_match_many_empty(self):
+        matcher = StationMatcher([], version=0)
+
+        with pytest.raises(ValueError):
+            matcher.match_many(["Kiel"])
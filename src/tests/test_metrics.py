@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from prometheus_client import CollectorRegistry, Counter
+
+from bot import metrics
+from bot.metrics import MetricsServer
+
+
+class TestMetrics:
+    def test_bot_metrics_are_registered(self):
+        metrics.TELEGRAM_MESSAGES.labels(method="sendMessage").inc()
+
+        value = metrics.REGISTRY.get_sample_value(
+            "station_bot_telegram_messages_total",
+            {"method": "sendMessage"},
+        )
+        assert value is not None
+        assert value >= 1
+
+    def test_gauge_function(self):
+        values = [1, 2]
+        metrics.UPDATE_QUEUE_DEPTH.set_function(lambda: values[-1])
+
+        values.append(5)
+
+        assert metrics.REGISTRY.get_sample_value("station_bot_update_queue_depth") == 5
+
+
+class TestMetricsServer:
+    @pytest_asyncio.fixture
+    async def server(self):
+        registry = CollectorRegistry()
+        Counter("messages", "Sent messages", registry=registry).inc()
+        server = MetricsServer(registry, host="127.0.0.1", port=0)
+        await server.start()
+        yield server
+        await server.close()
+
+    @staticmethod
+    async def _get(server: MetricsServer, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    @pytest.mark.asyncio
+    async def test_serves_metrics(self, server):
+        response = await self._get(server, "/metrics")
+
+        head, _, body = response.partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200 OK")
+        assert b"messages_total 1.0\n" in body
+
+    @pytest.mark.asyncio
+    async def test_unknown_path(self, server):
+        response = await self._get(server, "/")
+
+        assert response.startswith(b"HTTP/1.1 404 Not Found")
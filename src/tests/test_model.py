@@ -145,3 +145,24 @@ class TestStation:
 
         result = Station.model_validate(data)
         assert result.tracks is None
+
+    def test_to_record(self, sample_station):
+        record = sample_station.to_record()
+
+        assert record.name == "Test Station"
+        assert record.name_link == "https://example.com/test_station"
+        assert record.town_link == "https://example.com/test_town"
+        assert record.stop_types == {StopType.F}
+        assert {route.link for route in record.routes} == {
+            None,
+            "https://example.com/test_route2",
+        }
+
+    def test_record_interns_shared_values(self, sample_station):
+        first = sample_station.to_record()
+        second = Station.model_validate(
+            sample_station.model_dump(mode="json")
+        ).to_record()
+
+        assert first.district is second.district
+        assert first.town is second.town
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+from telegram import Chat, Message, Update
+
+from bot.processor import ChatOrderedUpdateProcessor
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(UTC),
+            chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        ),
+    )
+
+
+class TestChatOrderedUpdateProcessor:
+    @pytest.fixture
+    def processor(self) -> ChatOrderedUpdateProcessor:
+        return ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+
+    @pytest.mark.asyncio
+    async def test_keeps_chat_order(self, processor):
+        events: list[int] = []
+
+        async def handle(update_id: int, delay: float) -> None:
+            await asyncio.sleep(delay)
+            events.append(update_id)
+
+        await asyncio.gather(
+            processor.process_update(_update(1, 1), handle(1, 0.02)),
+            processor.process_update(_update(2, 1), handle(2, 0)),
+            processor.process_update(_update(3, 1), handle(3, 0.01)),
+        )
+
+        assert events == [1, 2, 3]
+        assert processor.active_chats == 0
+
+    @pytest.mark.asyncio
+    async def test_chats_run_concurrently(self, processor):
+        events: list[int] = []
+        blocker = asyncio.Event()
+
+        async def slow() -> None:
+            await blocker.wait()
+            events.append(1)
+
+        async def fast() -> None:
+            events.append(2)
+            blocker.set()
+
+        await asyncio.gather(
+            processor.process_update(_update(1, 1), slow()),
+            processor.process_update(_update(2, 2), fast()),
+        )
+
+        assert events == [2, 1]
+
+    @pytest.mark.asyncio
+    async def test_limits_running_updates(self, processor):
+        running: list[int] = []
+        release = asyncio.Event()
+
+        async def handle() -> None:
+            running.append(processor.running_updates)
+            await release.wait()
+
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(i, i), handle()))
+            for i in range(4)
+        ]
+        await asyncio.sleep(0.01)
+
+        assert processor.running_updates == 2
+        assert processor.queue_depth == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+        assert max(running) == 2
+        assert processor.peak_queue_depth == 2
+        assert processor.processed_updates == 4
+        assert processor.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_counts_all_waiting_updates(self):
+        processor = ChatOrderedUpdateProcessor(max_concurrent_updates=1)
+        handled: list[int] = []
+        release = asyncio.Event()
+
+        async def handle(update_id: int) -> None:
+            await release.wait()
+            handled.append(update_id)
+
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(i, i), handle(i)))
+            for i in range(32)
+        ]
+        await asyncio.sleep(0.01)
+
+        assert processor.running_updates == 1
+        assert processor.queue_depth == 31
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+        # No update is dropped, however many are waiting
+        assert sorted(handled) == list(range(32))
+        assert processor.queue_depth == 0
@@ -0,0 +1,135 @@
+from datetime import date
+
+from bot.matching import StationMatch
+from bot.render import (
+    ProgressLines,
+    format_done_reply,
+    format_done_summary,
+    format_link,
+    format_progress_line,
+    paginate,
+)
+from tests.stations import create_station
+
+
+def test_format_link():
+    assert format_link("Kiel", None) == "Kiel"
+    assert format_link("Kiel", "https://example.com") == (
+        "<a href='https://example.com'>Kiel</a>"
+    )
+
+
+def test_format_progress_line():
+    assert format_progress_line("Kiel", date(2024, 3, 1)) == "Kiel (01.03.2024)"
+
+
+def test_format_done_summary():
+    lines = format_done_summary(
+        [create_station("Kiel Hbf"), create_station("Plön")],
+        [(create_station("Neumünster"), date(2024, 3, 1))],
+        [StationMatch(query="<Lübek>", station=create_station("Lübeck Hbf"), ratio=90)],
+    )
+
+    assert list(lines) == [
+        "Als besucht markiert:",
+        "- Kiel Hbf",
+        "- Plön",
+        "",
+        "Schon besucht:",
+        "- Neumünster (01.03.2024)",
+        "",
+        "Nicht zugeordnet:",
+        "- &lt;Lübek&gt; (meintest du <code>Lübeck Hbf</code>?)",
+    ]
+
+
+def test_format_done_summary_escapes_names():
+    lines = format_done_summary(
+        [create_station("A & B")],
+        [(create_station("<C>"), date(2024, 3, 1))],
+        [StationMatch(query="D", station=create_station("D & E"), ratio=90)],
+    )
+
+    assert list(lines) == [
+        "Als besucht markiert:",
+        "- A &amp; B",
+        "",
+        "Schon besucht:",
+        "- &lt;C&gt; (01.03.2024)",
+        "",
+        "Nicht zugeordnet:",
+        "- D (meintest du <code>D &amp; E</code>?)",
+    ]
+
+
+def test_format_done_reply():
+    station = create_station("A & B")
+
+    assert format_done_reply([station], [], []) == (
+        "Der Bahnhof A &amp; B wurde als besucht markiert."
+    )
+    assert format_done_reply([], [(station, date(2024, 3, 1))], []) == (
+        "Der Bahnhof A &amp; B wurde schon am 01.03.2024 besucht."
+    )
+    assert (
+        format_done_reply([], [], [StationMatch(query="A", station=station, ratio=90)])
+        == "Sorry, das konnte ich nicht zuordnen. Meintest du <code>A &amp; B</code>?"
+    )
+
+
+def test_format_done_summary_skips_empty_sections():
+    lines = format_done_summary([], [(create_station("Plön"), date(2024, 3, 1))], [])
+
+    assert list(lines) == ["Schon besucht:", "- Plön (01.03.2024)"]
+
+
+class TestProgressLines:
+    def test_sorted(self):
+        lines = ProgressLines([("b", "B"), ("c", "C"), ("a", "A")])
+
+        assert list(lines.lines) == ["A", "B", "C"]
+
+    def test_add(self):
+        lines = ProgressLines([("b", "B"), ("d", "D")])
+
+        lines.add("c", "C")
+        lines.add("a", "A")
+        lines.add("e", "E")
+
+        assert list(lines.lines) == ["A", "B", "C", "D", "E"]
+
+    def test_add_replaces(self):
+        lines = ProgressLines([("a", "A")])
+
+        lines.add("a", "A2")
+
+        assert list(lines.lines) == ["A2"]
+
+    def test_remove(self):
+        lines = ProgressLines([("a", "A"), ("b", "B")])
+
+        lines.remove("a")
+        lines.remove("x")
+
+        assert list(lines.lines) == ["B"]
+
+
+class TestPaginate:
+    def test_single_page(self):
+        assert list(paginate(["a", "b", "c"], limit=5)) == ["a\nb\nc"]
+
+    def test_split_between_lines(self):
+        assert list(paginate(["aa", "bb", "cc", "d"], limit=5)) == [
+            "aa\nbb",
+            "cc\nd",
+        ]
+
+    def test_long_line(self):
+        assert list(paginate(["a", "bbbbbbb", "c"], limit=5)) == [
+            "a",
+            "bbbbbbb",
+            "c",
+        ]
+
+    def test_empty(self):
+        assert list(paginate([], limit=5)) == []
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from bot.scheduler import RefreshScheduler
+
+
+class _Refresh:
+    def __init__(self, results: list[bool]) -> None:
+        self.results = results
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> bool:
+        self.calls += 1
+        await self.release.wait()
+        if self.calls > len(self.results):
+            return True
+        return self.results[self.calls - 1]
+
+
+def _create_scheduler(refresh: _Refresh, **kwargs: float) -> RefreshScheduler:
+    return RefreshScheduler(
+        refresh,
+        interval=kwargs.get("interval", 60),
+        jitter=kwargs.get("jitter", 0),
+        min_backoff=kwargs.get("min_backoff", 0.01),
+        max_backoff=kwargs.get("max_backoff", 0.04),
+    )
+
+
+class TestRefreshScheduler:
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        refresh = _Refresh([True])
+        refresh.release.clear()
+        scheduler = _create_scheduler(refresh)
+
+        first = asyncio.create_task(scheduler.refresh_now())
+        second = asyncio.create_task(scheduler.refresh_now())
+        await asyncio.sleep(0)
+        refresh.release.set()
+
+        assert await first
+        assert await second
+        assert refresh.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_failure_counting(self):
+        scheduler = _create_scheduler(_Refresh([False, False, True]))
+
+        assert not await scheduler.refresh_now()
+        assert not await scheduler.refresh_now()
+        assert scheduler.failures == 2
+        assert await scheduler.refresh_now()
+        assert scheduler.failures == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_is_failure(self):
+        async def refresh() -> bool:
+            raise ValueError("nope")
+
+        scheduler = RefreshScheduler(
+            refresh,
+            interval=60,
+            jitter=0,
+            min_backoff=1,
+            max_backoff=1,
+        )
+
+        assert not await scheduler.refresh_now()
+        assert scheduler.failures == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_with_backoff(self):
+        refresh = _Refresh([False, False, False])
+        scheduler = _create_scheduler(refresh)
+
+        scheduler.start(immediately=True)
+        # 0 + 0.01 + 0.02 + 0.04 seconds until the fourth attempt
+        await asyncio.sleep(0.5)
+        await scheduler.stop()
+
+        assert refresh.calls == 4
+        assert scheduler.failures == 0
+
+    @pytest.mark.asyncio
+    async def test_start_twice(self):
+        scheduler = _create_scheduler(_Refresh([]))
+        scheduler.start()
+
+        with pytest.raises(ValueError):
+            scheduler.start()
+
+        await scheduler.stop()
@@ -0,0 +1,42 @@
+from bot.model import CacheValidators
+from bot.snapshot import StationSnapshot, load_snapshot, store_snapshot
+from tests.stations import create_station
+
+
+class TestSnapshot:
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "stations.snapshot"
+        snapshot = StationSnapshot(
+            stations=[
+                create_station("Kiel Hbf", link="https://example.com/kiel", tracks=2),
+                create_station("Neumünster"),
+            ],
+            wiki_validators={
+                "/wiki/Stations": CacheValidators(etag='"v1"', last_modified=None),
+            },
+        )
+
+        store_snapshot(path, snapshot, parser_version=1)
+
+        assert load_snapshot(path, parser_version=1) == snapshot
+
+    def test_missing(self, tmp_path):
+        assert load_snapshot(tmp_path / "missing", parser_version=1) is None
+
+    def test_parser_version_mismatch(self, tmp_path):
+        path = tmp_path / "stations.snapshot"
+        snapshot = StationSnapshot(stations=[], wiki_validators={})
+        store_snapshot(path, snapshot, parser_version=1)
+
+        assert load_snapshot(path, parser_version=2) is None
+
+    def test_corrupt(self, tmp_path):
+        path = tmp_path / "stations.snapshot"
+        store_snapshot(
+            path,
+            StationSnapshot(stations=[], wiki_validators={}),
+            parser_version=1,
+        )
+        path.write_bytes(path.read_bytes()[:-4])
+
+        assert load_snapshot(path, parser_version=1) is None
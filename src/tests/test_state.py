@@ -0,0 +1,178 @@
+from datetime import date
+
+import pytest
+
+from bot.state import CachingStateStorage, StateConflictException, StationState
+from tests.stations import create_station
+
+
+class _CountingStorage:
+    def __init__(self, state: StationState) -> None:
+        self.state = state
+        self.loads = 0
+        self.stores = 0
+        self.closed = False
+
+    async def load(self) -> StationState:
+        self.loads += 1
+        return self.state
+
+    async def store(self, state: StationState) -> None:
+        self.stores += 1
+        self.state = state
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class TestCachingStateStorage:
+    @pytest.fixture
+    def backend(self) -> _CountingStorage:
+        return _CountingStorage(
+            StationState.empty().update_stations([create_station("Kiel Hbf")])
+        )
+
+    @pytest.fixture
+    def storage(self, backend) -> CachingStateStorage[StationState]:
+        return CachingStateStorage(backend)  # type: ignore[arg-type]
+
+    @pytest.mark.asyncio
+    async def test_load_is_cached(self, backend, storage):
+        first = await storage.load()
+        second = await storage.load()
+
+        assert first is second
+        assert backend.loads == 1
+        assert storage.misses == 1
+        assert storage.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_store_writes_through(self, backend, storage):
+        state = await storage.load()
+        new_state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+
+        await storage.store(new_state)
+
+        assert backend.stores == 1
+        assert backend.state is new_state
+        assert await storage.load() is new_state
+        assert backend.loads == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self, backend, storage):
+        await storage.load()
+        storage.invalidate()
+        await storage.load()
+
+        assert backend.loads == 2
+        assert storage.misses == 2
+
+    @pytest.mark.asyncio
+    async def test_compare_and_store(self, backend, storage):
+        state = await storage.load()
+        new_state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+
+        await storage.compare_and_store(state, new_state)
+
+        assert backend.state is new_state
+        assert await storage.load() is new_state
+
+    @pytest.mark.asyncio
+    async def test_compare_and_store_conflict(self, backend, storage):
+        state = await storage.load()
+        await storage.store(state.mark_as_done(state.stations[0], date(2024, 1, 1)))
+
+        with pytest.raises(StateConflictException):
+            await storage.compare_and_store(
+                state, state.mark_as_done(state.stations[0], date(2024, 1, 2))
+            )
+
+        assert backend.stores == 1
+
+    @pytest.mark.asyncio
+    async def test_close(self, backend, storage):
+        await storage.close()
+
+        assert backend.closed
+
+
+class TestStationState:
+    def test_update_stations_bumps_version(self):
+        state = StationState.empty().update_stations([create_station("Kiel Hbf")])
+
+        assert state.stations_version == 1
+
+    def test_update_stations_unchanged(self):
+        state = StationState.empty().update_stations([create_station("Kiel Hbf")])
+
+        assert state.update_stations([create_station("Kiel Hbf")]) is state
+
+    def test_mark_as_done_keeps_version(self):
+        state = StationState.empty().update_stations([create_station("Kiel Hbf")])
+        state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+
+        assert state.stations_version == 1
+        assert state.mark_undone("Kiel Hbf").stations_version == 1
+
+    def test_mark_many_as_done(self):
+        state = StationState.empty().update_stations(
+            [
+                create_station("Kiel Hbf"),
+                create_station("Neumünster"),
+                create_station("Plön"),
+            ]
+        )
+
+        state = state.mark_many_as_done(state.stations[:2], date(2024, 1, 1))
+
+        assert state.done_date_by_station_name == {
+            "Kiel Hbf": date(2024, 1, 1),
+            "Neumünster": date(2024, 1, 1),
+        }
+
+    def test_mark_many_as_done_rejects_done_station(self):
+        state = StationState.empty().update_stations(
+            [create_station("Kiel Hbf"), create_station("Neumünster")]
+        )
+        state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+
+        with pytest.raises(ValueError):
+            state.mark_many_as_done(state.stations, date(2024, 1, 2))
+
+    def test_update_stations_matches_link_before_name(self):
+        state = StationState.empty().update_stations(
+            [
+                create_station("Kiel Hbf", link="https://example.com/kiel"),
+                create_station("Kiel", link="https://example.com/other"),
+            ]
+        )
+
+        renamed = create_station("Kiel", link="https://example.com/kiel")
+        updated = state.update_stations([renamed])
+
+        assert list(updated.stations) == [renamed, state.stations[1]]
+
+    def test_update_stations_falls_back_to_name(self):
+        state = StationState.empty().update_stations(
+            [
+                create_station("Kiel Hbf"),
+                create_station("Neumünster"),
+            ]
+        )
+
+        linked = create_station("Neumünster", link="https://example.com/nms")
+        fresh = create_station("Lübeck Hbf")
+        updated = state.update_stations([fresh, linked])
+
+        assert list(updated.stations) == [state.stations[0], linked, fresh]
+
+    def test_migrates_single_page_validators(self):
+        state = StationState.model_validate(
+            {
+                "stations": [],
+                "done_date_by_station_name": {},
+                "wiki_validators": {"etag": '"v1"', "last_modified": None},
+            }
+        )
+
+        assert state.wiki_validators == {}
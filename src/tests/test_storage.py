@@ -0,0 +1,245 @@
+from datetime import date
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from pydantic import ValidationError
+from redis.exceptions import WatchError
+
+from bot.state import StateConflictException, StationState
+from bot.storage import (
+    STATIONS_SCHEMA_VERSION,
+    RedisStationStorage,
+    StationListPayload,
+    decode_station_list,
+)
+from tests.stations import create_station
+
+
+class _FakePipeline:
+    def __init__(self, redis: _FakeRedis) -> None:
+        self._redis = redis
+        self._commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]] = []
+        self._watched_revision: int | None = None
+        self._immediate = False
+
+    async def __aenter__(self) -> _FakePipeline:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def __getattr__(self, name: str) -> Any:
+        def queue(*args: Any, **kwargs: Any) -> None:
+            self._commands.append((name, args, kwargs))
+
+        return queue
+
+    async def watch(self, key: str) -> None:
+        self._watched_revision = self._redis.revision
+        self._immediate = True
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def get(self, key: str) -> Any:
+        if self._immediate:
+            return self._redis.get(key)
+
+        self._commands.append(("get", (key,), {}))
+        return None
+
+    async def execute(self) -> list[Any]:
+        watched = self._watched_revision
+        if watched is not None and watched != self._redis.revision:
+            raise WatchError()
+
+        self._redis.commands.extend(name for name, _, _ in self._commands)
+        return [
+            getattr(self._redis, f"_{name}")(*args, **kwargs)
+            for name, args, kwargs in self._commands
+        ]
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, Any] = {}
+        self.commands: list[str] = []
+
+    def pipeline(self, transaction: bool) -> _FakePipeline:
+        return _FakePipeline(self)
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.values)
+
+    @property
+    def revision(self) -> int:
+        return int(self.values.get("test:revision", 0))
+
+    async def get(self, key: str) -> bytes | None:
+        return self._get(key)
+
+    def _get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    def _set(self, key: str, value: str) -> None:
+        self.values[key] = value.encode("utf-8")
+
+    def _incr(self, key: str) -> int:
+        value = int(self.values.get(key, 0)) + 1
+        self.values[key] = str(value).encode("utf-8")
+        return value
+
+    def _delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+    def _hgetall(self, key: str) -> dict[bytes, bytes]:
+        return dict(self.values.get(key, {}))
+
+    def _hset(self, key: str, mapping: dict[str, str]) -> None:
+        fields = self.values.setdefault(key, {})
+        for name, value in mapping.items():
+            fields[name.encode("utf-8")] = value.encode("utf-8")
+
+    def _hdel(self, key: str, *names: str) -> None:
+        fields = self.values.get(key, {})
+        for name in names:
+            fields.pop(name.encode("utf-8"), None)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class TestRedisStationStorage:
+    @pytest.fixture
+    def redis(self) -> _FakeRedis:
+        return _FakeRedis()
+
+    @pytest_asyncio.fixture
+    async def storage(self, redis) -> RedisStationStorage:
+        storage = RedisStationStorage(redis, key_prefix="test")  # type: ignore[arg-type]
+        await storage.initialize(
+            StationState.empty().update_stations(
+                [create_station("Kiel Hbf"), create_station("Neumünster")]
+            )
+        )
+        return storage
+
+    @pytest.mark.asyncio
+    async def test_round_trip(self, storage):
+        state = await storage.load()
+        state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+        await storage.store(state)
+
+        assert await storage.load() == state
+
+    @pytest.mark.asyncio
+    async def test_mark_as_done_writes_single_field(self, redis, storage):
+        state = await storage.load()
+        redis.commands.clear()
+
+        await storage.store(state.mark_as_done(state.stations[0], date(2024, 1, 1)))
+
+        assert redis.commands == ["hset", "incr"]
+
+    @pytest.mark.asyncio
+    async def test_mark_undone_deletes_field(self, redis, storage):
+        state = await storage.load()
+        state = state.mark_as_done(state.stations[0], date(2024, 1, 1))
+        await storage.store(state)
+        redis.commands.clear()
+
+        await storage.store(state.mark_undone("Kiel Hbf"))
+
+        assert redis.commands == ["hdel", "incr"]
+        assert redis.values["test:done"] == {}
+
+    @pytest.mark.asyncio
+    async def test_compare_and_store(self, storage):
+        state = await storage.load()
+
+        await storage.compare_and_store(
+            state.mark_as_done(state.stations[0], date(2024, 1, 1))
+        )
+
+        assert "Kiel Hbf" in (await storage.load()).done_date_by_station_name
+
+    @pytest.mark.asyncio
+    async def test_compare_and_store_conflict(self, redis, storage):
+        state = await storage.load()
+        other = RedisStationStorage(redis, key_prefix="test")  # type: ignore[arg-type]
+        other_state = await other.load()
+        await other.store(
+            other_state.mark_as_done(other_state.stations[1], date.today())
+        )
+
+        with pytest.raises(StateConflictException):
+            await storage.compare_and_store(
+                state.mark_as_done(state.stations[0], date(2024, 1, 1))
+            )
+
+        assert "Kiel Hbf" not in (await storage.load()).done_date_by_station_name
+
+    @pytest.mark.asyncio
+    async def test_migrates_legacy_state(self, redis):
+        legacy = StationState.empty().update_stations([create_station("Kiel Hbf")])
+        legacy = legacy.mark_as_done(legacy.stations[0], date(2024, 1, 1))
+        redis.values["legacy"] = legacy.model_dump_json().encode("utf-8")
+
+        storage = RedisStationStorage(redis, key_prefix="test")  # type: ignore[arg-type]
+        await storage.initialize(StationState.empty(), legacy_key="legacy")
+
+        assert await storage.load() == legacy
+
+    @pytest.mark.asyncio
+    async def test_keeps_invalid_legacy_state(self, redis):
+        legacy = StationState.empty().update_stations(
+            [create_station("Kiel Hbf", link="not a url")]
+        )
+        legacy = legacy.mark_as_done(legacy.stations[0], date(2024, 1, 1))
+        raw = legacy.model_dump_json().encode("utf-8")
+        redis.values["legacy"] = raw
+
+        storage = RedisStationStorage(redis, key_prefix="test")  # type: ignore[arg-type]
+        with pytest.raises(ValidationError):
+            await storage.initialize(StationState.empty(), legacy_key="legacy")
+
+        # The migration is retried on the next start
+        assert not await redis.exists("test:stations")
+        assert redis.values["legacy"] == raw
+
+
+class TestDecodeStationList:
+    @staticmethod
+    def _payload(*, schema_version: int, link: str) -> str:
+        return StationListPayload(
+            schema_version=schema_version,
+            stations=[create_station("Kiel Hbf", link=link)],
+            stations_version=3,
+            wiki_validators={},
+        ).model_dump_json()
+
+    def test_trusts_current_schema(self):
+        raw = self._payload(schema_version=STATIONS_SCHEMA_VERSION, link="not a url")
+
+        payload = decode_station_list(raw)
+
+        assert payload.stations[0].name_link == "not a url"
+        assert payload.stations_version == 3
+
+    def test_validates_outdated_schema(self):
+        raw = self._payload(schema_version=0, link="https://example.com/kiel")
+
+        payload = decode_station_list(raw)
+
+        assert payload.schema_version == STATIONS_SCHEMA_VERSION
+        assert payload.stations[0].name_link == "https://example.com/kiel"
+
+    def test_rejects_invalid_outdated_schema(self):
+        raw = self._payload(schema_version=0, link="not a url")
+
+        with pytest.raises(ValidationError):
+            decode_station_list(raw)
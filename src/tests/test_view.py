@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+from bot.state import StationState
+from bot.view import OpenStations, StationView
+from tests.stations import create_station
+
+
+class TestOpenStations:
+    def test_discard(self):
+        stations = [create_station(name) for name in ["A", "B", "C", "D"]]
+        open_stations = OpenStations(stations)
+
+        open_stations.discard("B")
+        open_stations.discard("D")
+        open_stations.discard("unknown")
+
+        assert len(open_stations) == 2
+        assert "B" not in open_stations
+        assert "A" in open_stations
+        assert "C" in open_stations
+
+    def test_add_is_idempotent(self):
+        station = create_station("A")
+        open_stations = OpenStations([station])
+
+        open_stations.add(station)
+
+        assert len(open_stations) == 1
+
+    def test_choice(self):
+        open_stations = OpenStations([create_station("A"), create_station("B")])
+        open_stations.discard("A")
+
+        for _ in range(10):
+            choice = open_stations.choice()
+            assert choice is not None
+            assert choice.name == "B"
+
+    def test_choice_empty(self):
+        assert OpenStations([]).choice() is None
+
+
+class TestStationView:
+    @pytest.fixture
+    def state(self) -> StationState:
+        return StationState.empty().update_stations(
+            [create_station("A"), create_station("B"), create_station("C")]
+        )
+
+    def test_apply_done(self, state):
+        view = StationView(state)
+        new_state = state.mark_many_as_done(state.stations[:2], date(2024, 1, 1))
+
+        view.apply_done(new_state, state.stations[:2])
+
+        assert view.state is new_state
+        assert view.open_station_count == 1
+        assert len(view.progress_lines) == 2
+
+    def test_mark_undone(self, state):
+        view = StationView(state.mark_as_done(state.stations[0], date(2024, 1, 1)))
+        assert view.open_station_count == 2
+
+        view.mark_undone("A")
+
+        assert view.open_station_count == 3
+
+    def test_for_state_keeps_matcher(self, state):
+        view = StationView(state)
+        matcher = view.matcher
+
+        other = view.for_state(state.mark_as_done(state.stations[0], date(2024, 1, 1)))
+
+        assert other.matcher is matcher
+        assert other.open_station_count == 2
+
+    def test_for_state_rebuilds_matcher(self, state):
+        view = StationView(state)
+        matcher = view.matcher
+
+        other = view.for_state(state.update_stations([create_station("D")]))
+
+        assert other.matcher is not matcher
+        assert other.for_state(other.state) is other
+
+    def test_warm_up(self, state):
+        view = StationView(state)
+
+        view.warm_up()
+
+        assert view._station_list._matcher is not None
+
+    def test_render_progress(self, state):
+        view = StationView(state.mark_as_done(state.stations[2], date(2024, 1, 2)))
+        view.apply_done(
+            view.state.mark_as_done(state.stations[0], date(2024, 1, 1)),
+            [state.stations[0]],
+        )
+
+        assert list(view.render_progress_pages(4096)) == [
+            "2 / 3\n\nA (01.01.2024)\nC (02.01.2024)"
+        ]
+
+    def test_render_progress_after_undone(self, state):
+        view = StationView(state.mark_as_done(state.stations[2], date(2024, 1, 2)))
+        view.mark_undone("C")
+
+        assert list(view.render_progress_pages(4096)) == ["0 / 3\n"]
+
+    def test_render_station_is_cached(self, state):
+        view = StationView(state)
+        card = view.render_station(state.stations[0])
+
+        assert card.startswith("Name: A\n")
+        other = view.for_state(state.mark_as_done(state.stations[1], date(2024, 1, 1)))
+        assert other.render_station(state.stations[0]) is card
@@ -1,11 +1,29 @@
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+
+import httpx
 import pytest
+from bs4 import BeautifulSoup
+from httpx import URL
 
 from bot.model import (
+    CacheValidators,
+    RobotsCache,
     Station,
     StationType,
     StopType,
 )
-from bot.wiki import WikipediaClient
+from bot.wiki import (
+    PARSER_VERSION,
+    WikipediaClient,
+    _StationParser,
+    _TableScanner,
+    validate_stations,
+)
+from tests.stations import STATION_LIST_PAGE, MemoryStorage
+
+_URL = URL("https://de.wikipedia.org/wiki/Liste")
+
 
 # This file was written by an AI, I just thinned out the most insane parts a bit lol.
 
@@ -14,7 +32,7 @@ from bot.wiki import WikipediaClient
 class TestGetStations:
     @pytest.fixture(scope="class")
     def client(self, config) -> WikipediaClient:
-        return WikipediaClient(config.user_agent)
+        return WikipediaClient(config.user_agent, config.wiki)
 
     @pytest.mark.integration
     @pytest.mark.asyncio
@@ -88,3 +106,304 @@ class TestGetStations:
             if station.tracks is not None:
                 assert isinstance(station.tracks, int)
                 assert station.tracks >= 0
+
+
+class TestConditionalFetch:
+    @pytest.fixture
+    def requests(self) -> list[httpx.Request]:
+        return []
+
+    @pytest.fixture
+    def client(self, config, requests) -> WikipediaClient:
+        def handle(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path == "/robots.txt":
+                return httpx.Response(200, text="User-agent: *\nAllow: /\n")
+
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+
+            return httpx.Response(
+                200,
+                text=STATION_LIST_PAGE,
+                headers={
+                    "ETag": '"v1"',
+                    "Last-Modified": "Wed, 01 May 2024 10:00:00 GMT",
+                },
+            )
+
+        return WikipediaClient(
+            config.user_agent,
+            config.wiki,
+            transport=httpx.MockTransport(handle),
+        )
+
+    @pytest.mark.asyncio
+    async def test_initial_fetch(self, client, config):
+        page = await client.fetch_stations()
+
+        assert page is not None
+        assert page.stations is not None
+        assert len(page.stations) == 2
+        assert page.complete
+        assert page.validators == {
+            config.wiki.page_paths[0]: CacheValidators(
+                etag='"v1"',
+                last_modified="Wed, 01 May 2024 10:00:00 GMT",
+                parser_version=PARSER_VERSION,
+            )
+        }
+
+    @pytest.mark.asyncio
+    async def test_not_modified(self, client, config, requests):
+        url_path = config.wiki.page_paths[0]
+        validators = CacheValidators(
+            etag='"v1"',
+            last_modified="Wed, 01 May 2024 10:00:00 GMT",
+            parser_version=PARSER_VERSION,
+        )
+
+        page = await client.fetch_stations({url_path: validators})
+
+        assert page is not None
+        assert page.stations is None
+        assert page.validators == {url_path: validators}
+        assert requests[-1].headers["If-Modified-Since"] == validators.last_modified
+
+    @pytest.mark.asyncio
+    async def test_reuses_client(self, client):
+        await client.fetch_stations()
+        http_client = client._get_client()
+        await client.fetch_stations()
+
+        assert client._get_client() is http_client
+
+    @pytest.mark.asyncio
+    async def test_close(self, client):
+        http_client = client._get_client()
+
+        await client.close()
+
+        assert http_client.is_closed
+        assert client._get_client() is not http_client
+
+
+class TestMultiplePages:
+    @pytest.fixture
+    def client(self, config) -> WikipediaClient:
+        def handle(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/robots.txt":
+                return httpx.Response(200, text="User-agent: *\nAllow: /\n")
+
+            if path == "/wiki/Broken":
+                return httpx.Response(500)
+
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+
+            return httpx.Response(200, text=STATION_LIST_PAGE, headers={"ETag": '"v1"'})
+
+        wiki_config = replace(
+            config.wiki,
+            page_paths=("/wiki/A", "/wiki/B", "/wiki/Broken"),
+            request_interval_ms=0,
+        )
+        return WikipediaClient(
+            config.user_agent,
+            wiki_config,
+            transport=httpx.MockTransport(handle),
+        )
+
+    @pytest.mark.asyncio
+    async def test_merges_pages(self, client):
+        pages = await client.fetch_stations()
+
+        assert pages is not None
+        assert pages.stations is not None
+        assert len(pages.stations) == 4
+        assert set(pages.validators) == {"/wiki/A", "/wiki/B"}
+        assert not pages.complete
+
+    @pytest.mark.asyncio
+    async def test_only_modified_pages(self, client):
+        validators = CacheValidators(
+            etag='"v1"',
+            last_modified=None,
+            parser_version=PARSER_VERSION,
+        )
+
+        pages = await client.fetch_stations({"/wiki/A": validators})
+
+        assert pages is not None
+        assert pages.stations is not None
+        assert len(pages.stations) == 2
+        assert pages.validators == {"/wiki/A": validators, "/wiki/B": validators}
+
+
+class TestRobotsCache:
+    @pytest.fixture
+    def now(self) -> list[datetime]:
+        return [datetime(2024, 5, 1, 12, tzinfo=UTC)]
+
+    @pytest.fixture
+    def responses(self) -> list[int]:
+        return []
+
+    @pytest.fixture
+    def storage(self) -> MemoryStorage[RobotsCache]:
+        return MemoryStorage(RobotsCache.empty())
+
+    @pytest.fixture
+    def client(self, config, now, responses, storage, monkeypatch) -> WikipediaClient:
+        def handle(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/robots.txt":
+                status = responses.pop(0) if responses else 200
+                return httpx.Response(status, text="User-agent: *\nAllow: /\n")
+
+            return httpx.Response(200, text=STATION_LIST_PAGE)
+
+        async def create_storage(initial: RobotsCache) -> MemoryStorage[RobotsCache]:
+            return storage
+
+        client = WikipediaClient(
+            config.user_agent,
+            config.wiki,
+            transport=httpx.MockTransport(handle),
+            robots_storage_factory=create_storage,  # type: ignore[arg-type]
+        )
+        monkeypatch.setattr(client, "_now", lambda: now[0])
+        return client
+
+    @pytest.mark.asyncio
+    async def test_success_is_persisted(self, client, now, storage):
+        assert await client._get_robots() is not None
+
+        assert storage.state.content is not None
+        assert storage.state.failures == 0
+        assert storage.state.is_fresh(now[0])
+
+    @pytest.mark.asyncio
+    async def test_uses_persisted_copy(self, client, now, responses, storage):
+        storage.state = RobotsCache(
+            content="User-agent: *\nAllow: /\n",
+            expires_at=now[0] + timedelta(hours=1),
+            failures=0,
+        )
+        # Would fail if robots.txt were requested
+        responses.append(500)
+
+        assert await client._get_robots() is not None
+        assert responses == [500]
+
+    @pytest.mark.asyncio
+    async def test_failure_is_retried_after_backoff(
+        self, client, config, now, responses
+    ):
+        responses.append(500)
+
+        assert await client._get_robots() is None
+        assert await client._get_robots() is None
+        assert client._robots_cache.failures == 1
+
+        now[0] += timedelta(seconds=config.wiki.robots_min_backoff_seconds)
+
+        assert await client._get_robots() is not None
+        assert client._robots_cache.failures == 0
+
+    @pytest.mark.asyncio
+    async def test_keeps_stale_copy_on_failure(self, client, config, now, responses):
+        robots = await client._get_robots()
+        now[0] += timedelta(seconds=config.wiki.robots_ttl_seconds)
+        responses.append(503)
+
+        assert await client._get_robots() is robots
+        assert client._robots_cache.failures == 1
+
+
+class TestTableScanner:
+    @pytest.mark.parametrize("chunk_size", [1, 16, 1024])
+    def test_chunked(self, chunk_size):
+        scanner = _TableScanner()
+        for start in range(0, len(STATION_LIST_PAGE), chunk_size):
+            scanner.feed(STATION_LIST_PAGE[start : start + chunk_size])
+            if scanner.is_complete:
+                break
+
+        assert scanner.is_complete
+        table = BeautifulSoup(scanner.table_html, "html.parser").table
+        expected = BeautifulSoup(STATION_LIST_PAGE, "html.parser").find_all("table")[0]
+        assert str(table) == str(expected)
+
+    def test_no_table(self):
+        scanner = _TableScanner()
+        scanner.feed("<html><body><p>Nothing</p></body></html>")
+
+        assert not scanner.is_complete
+        assert scanner.table_html is None
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+    def test_skips_comments_and_nested_tables(self, chunk_size):
+        table = (
+            "<TABLE class='outer'><tr><td><table><tr><td>1</td></tr></table>"
+            "</td></tr></Table >"
+        )
+        page = f"<!-- <table> --><style>table {{}}</style><p>x</p>{table}<table>"
+        scanner = _TableScanner()
+        for start in range(0, len(page), chunk_size):
+            scanner.feed(page[start : start + chunk_size])
+
+        assert scanner.is_complete
+        assert scanner.table_html == table
+
+    def test_incomplete_table(self):
+        scanner = _TableScanner()
+        scanner.feed("<p>x</p><table><tr><td>1</td>")
+
+        assert not scanner.is_complete
+        assert scanner.table_html == "<table><tr><td>1</td>"
+
+
+class TestStationParser:
+    def test_matches_document_parser(self):
+        parser = _StationParser(_URL)
+
+        stations = parser.parse_stations(STATION_LIST_PAGE)
+
+        assert stations is not None
+        assert len(stations) == 2
+        assert stations == parser.parse_soup(
+            BeautifulSoup(STATION_LIST_PAGE, "html.parser")
+        )
+
+    def test_parse_station(self):
+        parser = _StationParser(_URL)
+
+        stations = parser.parse_stations(STATION_LIST_PAGE)
+
+        assert stations is not None
+        station = stations[0]
+        assert station.name == "Kiel Hbf"
+        assert str(station.name_link) == "https://de.wikipedia.org/wiki/Kiel_Hbf"
+        assert station.type == StationType.BAHNHOF
+        assert station.tracks == 8
+        assert station.stop_types == {StopType.F, StopType.R}
+        assert {route.name for route in station.routes} == {"Strecke A", "Strecke B"}
+        assert station.notes == "Umbau geplant [1]"
+
+    def test_no_table(self):
+        parser = _StationParser(_URL)
+
+        assert parser.parse_stations("<html></html>") is None
+
+    def test_validate_skips_invalid(self):
+        parser = _StationParser(_URL)
+        data = parser.parse_table_data(
+            BeautifulSoup(STATION_LIST_PAGE, "html.parser").table.decode()  # type: ignore[union-attr]
+        )
+        assert data is not None
+        data[1]["district"] = " "
+
+        stations = validate_stations(data)
+
+        assert [station.name for station in stations] == ["Kiel Hbf"]